@@ -0,0 +1,82 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# ------------------------------------------------
+# Cold-start check: how long each entry point takes to import in a fresh
+# interpreter, and that no heavy library is loaded before it is needed
+# ------------------------------------------------
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Entry point -> (module imported, target in seconds for the whole process)
+ENTRY_POINTS = {
+    "gui": ("main", 0.5),
+    "pipeline": ("PyLog.function.pipeline", 0.3),
+    "service": ("PyLog.function.scoring_service", 0.3),
+    "results": ("PyLog.function.results_store", 0.3),
+}
+
+# Libraries that must stay unloaded (or only lazily registered) after import
+HEAVY_MODULES = ["numpy", "sklearn", "scipy", "pandas", "pyarrow", "matplotlib", "joblib"]
+
+RUNS = 5
+
+# Prints the heavy modules that were really executed; modules registered by
+# lazy_import are _LazyModule instances until first use
+_PROBE = """
+import sys, types
+import {module}
+print(",".join(name for name in {heavy!r}
+               if type(sys.modules.get(name)) is types.ModuleType))
+"""
+
+
+def measure(module, runs=RUNS):
+    """
+    Best wall time over runs fresh interpreters importing module, and the
+    heavy modules that import loaded.
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    code = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+
+    best = None
+    loaded = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=REPO_ROOT, env=env,
+            capture_output=True, text=True, check=True
+        )
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+        loaded = [name for name in out.stdout.strip().split(",") if name]
+
+    return best, loaded
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description="Check entry-point import times against their targets")
+    cli.add_argument("--runs", type=int, default=RUNS)
+    args = cli.parse_args(argv)
+
+    failed = False
+    print(f"{'entry point':<12} {'module':<34} {'seconds':>8} {'target':>7}  heavy modules loaded")
+    for name, (module, target) in ENTRY_POINTS.items():
+        seconds, loaded = measure(module, args.runs)
+        ok = seconds <= target and not loaded
+        failed |= not ok
+        print(f"{name:<12} {module:<34} {seconds:>8.3f} {target:>7.2f}  {', '.join(loaded) or '-'}"
+              + ("" if ok else "  [!]"))
+
+    if failed:
+        print("\n[!] Cold start over target")
+        return 1
+
+    print("\n[+] Every entry point within its cold-start target")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import argparse
+import bz2
+import gzip
+import time
+
+import numpy as np
+
+# ------------------------------------------------
+# Seeded synthetic access logs for benchmarking
+# ------------------------------------------------
+# The same (lines, seed) always produces the same file, byte for byte.
+
+START = "2024-01-01T00:00:00"
+REQUESTS_PER_SECOND = 50      # average traffic rate; timestamps advance with it
+
+CHUNK = 100000                # lines generated and written per step
+
+# Share of each kind of line; the rest are normal requests
+MIX = {
+    "sqli": 0.03,
+    "cmdi": 0.02,
+    "xss": 0.02,
+    "glaspot": 0.03,
+    "garbage": 0.01,
+}
+
+# A few noisy sources send this share of all requests
+AGGRESSIVE_IPS = 20
+AGGRESSIVE_SHARE = 0.15
+CLIENT_IPS = 50000
+
+NORMAL_PATHS = [
+    "/", "/style.css", "/robots.txt", "/favicon.ico", "/index.php",
+    "/img/logo.png", "/js/app.js", "/about", "/products", "/blog/2024/01/post",
+    "/api/v1/items?id=3", "/login.php?user=bob", "/search?q=shoes",
+    "/static/css/main.css", "/docs/index.html",
+]
+
+SQLI_PATHS = [
+    "/search?q=1' or 1=1--",
+    "/item.php?id=1%27%20or%20%271%27=%271",
+    "/products?id=3 union select username,password from users",
+    "/login.php?user=admin'--",
+    "/news?id=5%20and%201=1",
+]
+
+CMDI_PATHS = [
+    "/cmd?x=;cat /etc/passwd",
+    "/ping.php?host=127.0.0.1;ls",
+    "/run?c=sleep%285%29",
+    "/exec?cmd=/bin/sh",
+    "/debug?q=echo+hacked",
+]
+
+XSS_PATHS = [
+    "/q?x=<script>alert(1)</script>",
+    "/comment?text=%3Cscript%3Ealert(document.cookie)%3C/script%3E",
+    "/search?term=<><script>",
+    "/profile?name=<></>",
+]
+
+# Share of normal requests to a path no other line uses (one item page
+# per line), so logs have as many distinct paths as real ones do
+UNIQUE_PATH_SHARE = 0.2
+
+GLASPOT_TYPES = ["sqli", "xss", "phpinfo", "rfi", "lfi"]
+
+METHODS = ["GET", "GET", "GET", "POST", "HEAD", "PUT", "DELETE"]
+STATUSES = [200, 200, 200, 301, 304, 404, 500]
+AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+    "Mozilla/5.0 (X11; Linux x86_64)",
+    "curl/8.4.0",
+    "sqlmap/1.7",
+]
+
+GARBAGE = "-- malformed entry --"
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def _ip_strings(values):
+    return [f"{v >> 24 & 255}.{v >> 16 & 255}.{v >> 8 & 255}.{v & 255}" for v in values.tolist()]
+
+
+def _chunk(rng, first, n, start_epoch, ips, aggressive):
+    """
+    Lines first .. first+n-1 as a list of strings.
+    """
+    # Indexes follow MIX order: sqli, cmdi, xss, glaspot, garbage, then normal
+    probs = np.array(list(MIX.values()) + [1 - sum(MIX.values())])
+    kind = rng.choice(len(probs), size=n, p=probs)
+
+    noisy = rng.random(n) < AGGRESSIVE_SHARE
+    source = np.where(noisy, rng.choice(aggressive, size=n), rng.choice(ips, size=n))
+    source = _ip_strings(source)
+
+    stamps = (start_epoch + (first + np.arange(n)) // REQUESTS_PER_SECOND).astype("datetime64[s]")
+    clock = np.datetime_as_string(stamps, unit="s")
+
+    pools = [SQLI_PATHS, CMDI_PATHS, XSS_PATHS]
+    normal = rng.integers(0, len(NORMAL_PATHS), size=n)
+    attack = rng.integers(0, 20, size=n)
+    method = rng.integers(0, len(METHODS), size=n)
+    status = rng.integers(0, len(STATUSES), size=n)
+    size = rng.integers(100, 20000, size=n)
+    agent = rng.integers(0, len(AGENTS), size=n)
+    glaspot = rng.integers(0, len(GLASPOT_TYPES), size=n)
+    unique = rng.random(n) < UNIQUE_PATH_SHARE
+
+    lines = []
+
+    for i in range(n):
+        k = kind[i]
+        stamp = clock[i]
+        # stamp is YYYY-MM-DDTHH:MM:SS
+        day, month, year, hms = stamp[8:10], MONTHS[int(stamp[5:7]) - 1], stamp[:4], stamp[11:]
+
+        if k == 3:
+            lines.append(f"{month} {day} {hms} honeypot Glaspot: {GLASPOT_TYPES[glaspot[i]]} attack method from {source[i]}")
+            continue
+        if k == 4:
+            lines.append(GARBAGE)
+            continue
+
+        if k < 3:
+            pool = pools[k]
+            path = pool[attack[i] % len(pool)]
+        elif unique[i]:
+            path = f"/item/{first + i}"
+        else:
+            path = NORMAL_PATHS[normal[i]]
+
+        lines.append(
+            f'{source[i]} - - [{day}/{month}/{year}:{hms} +0000] '
+            f'"{METHODS[method[i]]} {path} HTTP/1.1" {STATUSES[status[i]]} {size[i]} '
+            f'"-" "{AGENTS[agent[i]]}"'
+        )
+
+    return lines
+
+
+def open_output(out_file):
+    if out_file.endswith(".gz"):
+        return gzip.open(out_file, "wt", encoding="utf-8")
+    if out_file.endswith(".bz2"):
+        return bz2.open(out_file, "wt", encoding="utf-8")
+    return open(out_file, "w", encoding="utf-8")
+
+
+def generate(out_file, lines, seed=1):
+    """
+    Writes `lines` synthetic log lines to out_file (.gz/.bz2 compress).
+    Returns the number of bytes of text written.
+    """
+    rng = np.random.default_rng(seed)
+    ips = rng.integers(0x0A000000, 0x0AFFFFFF, size=CLIENT_IPS)
+    aggressive = rng.integers(0xC0A80000, 0xC0A8FFFF, size=AGGRESSIVE_IPS)
+    start_epoch = np.datetime64(START, "s").astype(np.int64)
+
+    written = 0
+    with open_output(out_file) as f:
+        for first in range(0, lines, CHUNK):
+            text = "\n".join(_chunk(rng, first, min(CHUNK, lines - first), start_epoch, ips, aggressive)) + "\n"
+            f.write(text)
+            written += len(text)
+
+    return written
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Write a seeded synthetic access log")
+    cli.add_argument("lines", type=int)
+    cli.add_argument("out_file")
+    cli.add_argument("--seed", type=int, default=1)
+    args = cli.parse_args()
+
+    began = time.perf_counter()
+    size = generate(args.out_file, args.lines, args.seed)
+    print(f"[+] {args.lines} lines ({size / 1024 ** 2:.1f} MB) written to {args.out_file} in {time.perf_counter() - began:.1f}s")
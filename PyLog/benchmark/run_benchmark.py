@@ -0,0 +1,251 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from PyLog.benchmark import generate_logs
+from PyLog.function import evaluate_model
+from PyLog.function import feature_registry
+from PyLog.function import frame_store
+from PyLog.function import instrument
+from PyLog.function import pipeline
+from PyLog.function import train_semisup_4
+
+# ------------------------------------------------
+# End-to-end pipeline benchmark against a stored baseline
+# ------------------------------------------------
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Named sizes for --size; any line count also works with --lines
+SIZES = {
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000,
+    "100m": 100_000_000,
+}
+
+# A phase regresses when it is this much slower / bigger than the baseline.
+# MIN_SLOWDOWN keeps sub-second phases from failing on timer noise.
+TIME_TOLERANCE = 0.25
+MIN_SLOWDOWN = 0.5       # seconds
+MEMORY_TOLERANCE = 0.25
+
+# Files a fresh working directory needs, relative to the repo root
+SEED_FILES = [
+    train_semisup_4.LEGACY_MODEL,
+    train_semisup_4.LEGACY_SCALER,
+    feature_registry.METHOD_VOCAB_FILE,
+]
+
+# Phases import these on first use; loading them up front keeps one-off
+# import time out of phase timings (cold_start.py measures that)
+WARM_IMPORTS = [
+    "sklearn.ensemble",
+    "sklearn.metrics",
+    "sklearn.preprocessing",
+    "PyLog.function.semisup_engine",
+]
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _phases():
+    """
+    (name, run, artifact whose rows the phase processed) for every phase,
+    forced so each one does its full work.
+    """
+    phases = []
+    for stage in pipeline.STAGES:
+        # Row counts come from the last artifact the stage writes, or reads
+        artifacts = [item for item in pipeline.outputs_of(stage) + pipeline.inputs_of(stage) if item in frame_store.ARTIFACTS]
+        phases.append((stage["name"], lambda stage=stage: stage["run"](True), artifacts[0]))
+    phases.append(("evaluate", lambda: evaluate_model.main() or True, "final_output"))
+    return phases
+
+
+def result_summary():
+    """
+    Counts that must not change unless the pipeline's behaviour does.
+    """
+    final = frame_store.load("final_output", columns=["label", "predicted_label", "behavior_anomaly"])
+    counts = {
+        column: {str(k): int(v) for k, v in final[column].value_counts().sort_index().items()}
+        for column in final.columns
+    }
+    counts["rows"] = len(final)
+    return counts
+
+
+def run(lines, seed=1, work_dir=None, log=print):
+    """
+    Generates a log, runs every phase in a scratch directory and returns
+    timings, throughput, peak memory and result counts.
+    """
+    owned = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="pylog_bench_")
+    cwd = os.getcwd()
+
+    for rel in SEED_FILES:
+        os.makedirs(os.path.join(work_dir, os.path.dirname(rel)), exist_ok=True)
+        shutil.copyfile(os.path.join(REPO_ROOT, rel), os.path.join(work_dir, rel))
+    for folder in ["data/input", "data/output"]:
+        os.makedirs(os.path.join(work_dir, folder), exist_ok=True)
+
+    log_file = os.path.join(work_dir, "data/input/input.log")
+    began = time.perf_counter()
+    size = generate_logs.generate(log_file, lines, seed)
+    log(f"[+] Generated {lines} lines ({size / 1024 ** 2:.1f} MB) in {time.perf_counter() - began:.1f}s")
+
+    report = {
+        "lines": lines,
+        "seed": seed,
+        "log_bytes": size,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "phases": {},
+    }
+
+    try:
+        os.chdir(work_dir)
+        frame_store.clear_memory()
+        for module in WARM_IMPORTS:
+            importlib.import_module(module)
+
+        for name, phase, artifact in _phases():
+            with instrument.measure(name, rows_in=lines if name == "parse" else None) as record:
+                ok = phase()
+                if ok:
+                    record["rows_out"] = frame_store.num_rows(artifact)
+
+            if not ok:
+                raise RuntimeError(f"phase {name} failed")
+
+            rows = lines if name == "parse" else record["rows_out"]
+            report["phases"][name] = {
+                "seconds": round(record["wall_s"], 4),
+                "cpu_seconds": round(record["cpu_s"], 4),
+                "rows": rows,
+                "rows_per_sec": round(record["rows_per_s"], 1) if record["rows_per_s"] else None,
+                "peak_rss_mb": round(record["peak_rss"] / 1024 ** 2, 1),
+            }
+            log(f"[+] {name}: {record['wall_s']:.2f}s, {rows} rows, {record['peak_rss'] / 1024 ** 2:.0f} MB peak")
+
+        report["results"] = result_summary()
+        report["total_seconds"] = round(sum(p["seconds"] for p in report["phases"].values()), 4)
+    finally:
+        os.chdir(cwd)
+        if owned:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return report
+
+
+def baseline_key(lines, seed):
+    return f"{lines}-{seed}"
+
+
+def load_baseline(path=BASELINE_FILE):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_baseline(report, path=BASELINE_FILE):
+    baseline = load_baseline(path)
+    baseline[baseline_key(report["lines"], report["seed"])] = report
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(report, base):
+    """
+    Returns a list of human-readable regressions of report against base.
+    """
+    problems = []
+
+    if report.get("results") != base.get("results"):
+        problems.append(f"results changed: {base.get('results')} -> {report.get('results')}")
+
+    for name, phase in report["phases"].items():
+        old = base["phases"].get(name)
+        if old is None:
+            continue
+
+        slower = phase["seconds"] - old["seconds"]
+        if slower > MIN_SLOWDOWN and phase["seconds"] > old["seconds"] * (1 + TIME_TOLERANCE):
+            problems.append(f"{name}: {old['seconds']:.2f}s -> {phase['seconds']:.2f}s")
+
+        if phase["peak_rss_mb"] > old["peak_rss_mb"] * (1 + MEMORY_TOLERANCE):
+            problems.append(f"{name}: peak memory {old['peak_rss_mb']:.0f} MB -> {phase['peak_rss_mb']:.0f} MB")
+
+    return problems
+
+
+def print_table(report, base=None):
+    print(f"\n{'phase':<10}{'seconds':>10}{'rows/s':>14}{'peak MB':>10}{'baseline s':>12}")
+    for name, phase in report["phases"].items():
+        old = base["phases"].get(name, {}) if base else {}
+        print(
+            f"{name:<10}{phase['seconds']:>10.2f}{phase['rows_per_sec'] or 0:>14,.0f}"
+            f"{phase['peak_rss_mb']:>10.0f}{old.get('seconds', float('nan')):>12.2f}"
+        )
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description="Benchmark every PyLog phase on a synthetic log")
+    size = cli.add_mutually_exclusive_group()
+    size.add_argument("--size", choices=SIZES, default="10k")
+    size.add_argument("--lines", type=int)
+    cli.add_argument("--seed", type=int, default=1)
+    cli.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    cli.add_argument("--work-dir", help="keep the scratch directory here instead of a temp dir")
+    cli.add_argument("--json", help="also write the report to this file")
+    cli.add_argument("--profile", choices=["cprofile", "sample"], help="profile every phase")
+    cli.add_argument("--profile-dir", default="bench_profiles", help="where --profile writes its files")
+    args = cli.parse_args(argv)
+
+    if args.profile:
+        instrument.PROFILE = args.profile
+        instrument.PROFILE_DIR = os.path.abspath(args.profile_dir)
+
+    lines = args.lines or SIZES[args.size]
+    report = run(lines, args.seed, args.work_dir)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    base = load_baseline().get(baseline_key(lines, args.seed))
+    print_table(report, base)
+
+    if args.update_baseline:
+        save_baseline(report)
+        print(f"\n[+] Baseline for {lines} lines (seed {args.seed}) saved to {BASELINE_FILE}")
+        return 0
+
+    if base is None:
+        print(f"\n[!] No baseline for {lines} lines (seed {args.seed}); run with --update-baseline")
+        return 0
+
+    problems = compare(report, base)
+    if problems:
+        print("\n[!] Regressions against baseline:")
+        for problem in problems:
+            print("    " + problem)
+        return 1
+
+    print("\n[+] No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from PyLog.function import evaluate_model
+from PyLog.function import frame_store
+from PyLog.function import progress
+from PyLog.function import records
+
+# ------------------------------------------------
+# Chart-ready aggregates of the final output, computed in one pass
+# ------------------------------------------------
+AGGREGATES_FILE = "data/output/aggregates.json"
+
+CHUNK_ROWS = 1_000_000
+
+# Heat map rows: the busiest source IPs only
+TOP_IPS = 25
+
+LABEL_NAMES = {
+    -1: "unlabeled",
+    0: "normal",
+    1: "honeypot",
+    5: "xss",
+    8: "cmdi",
+    9: "sqli",
+}
+
+SOURCES = {
+    "labeled": ["source_ip", "timestamp"],
+    "final_output": ["label", "predicted_label", "behavior_anomaly", "freq_label"],
+}
+
+
+def _add(total, part):
+    return part if total is None else total.add(part, fill_value=0)
+
+
+def _counts(series):
+    return {str(k): int(v) for k, v in series.sort_index().items()}
+
+
+def aggregate(chunk_rows=CHUNK_ROWS):
+    """
+    Returns the IP x hour heat map, alerts per threat type and label
+    distributions as plain dicts.
+    """
+    ip_hour = threat_alerts = predicted = labels = None
+    rows = 0
+    done = 0
+    total = frame_store.num_rows("final_output")
+
+    for df in frame_store.iter_aligned(SOURCES, chunk_rows):
+        rows += len(df)
+
+        # Glaspot rows carry no timestamp and stay out of the heat map
+        timestamp = df["timestamp"].to_numpy()
+        timed = timestamp != records.NO_TIME
+        ip_hour = _add(ip_hour, pd.DataFrame({
+            "source_ip": df["source_ip"].to_numpy()[timed],
+            "hour": timestamp[timed] % 86400 // 3600,
+        }).value_counts())
+
+        risk = evaluate_model.risk_scores(df)
+        threat_alerts = _add(threat_alerts, pd.DataFrame({
+            "threat_type": evaluate_model.threat_types(df),
+            "alert_level": evaluate_model.alert_levels(risk),
+        }).value_counts())
+
+        predicted = _add(predicted, df["predicted_label"].value_counts())
+        labels = _add(labels, df["label"].value_counts())
+
+        done += len(df)
+        progress.report(done, total)
+        progress.check()
+
+    heat = {"ips": [], "hours": list(range(24)), "counts": []}
+    if ip_hour is not None and len(ip_hour):
+        # Dotted IPs before unstacking, so rows sort (and ties break) by text
+        ip_hour.index = ip_hour.index.set_levels(
+            records.unpack_ips(ip_hour.index.levels[0]), level=0
+        )
+        grid = ip_hour.unstack(fill_value=0).reindex(columns=range(24), fill_value=0)
+        grid = grid.loc[grid.sum(axis=1).nlargest(TOP_IPS).index]
+        heat["ips"] = [str(ip) for ip in grid.index]
+        heat["counts"] = grid.to_numpy(dtype=np.int64).tolist()
+
+    alerts = {}
+    if threat_alerts is not None:
+        for (threat, level), count in threat_alerts.sort_index().items():
+            alerts.setdefault(str(threat), {})[str(level)] = int(count)
+
+    return {
+        "rows": rows,
+        "heat_map": heat,
+        "threat_alerts": alerts,
+        "predicted_labels": _counts(predicted) if predicted is not None else {},
+        "labels": _counts(labels) if labels is not None else {},
+        "label_names": {str(k): v for k, v in LABEL_NAMES.items()},
+    }
+
+
+def load_aggregates(path=AGGREGATES_FILE):
+    with open(path) as f:
+        return json.load(f)
+
+
+def summarize():
+    aggregates = aggregate()
+
+    os.makedirs(os.path.dirname(AGGREGATES_FILE) or ".", exist_ok=True)
+    with open(AGGREGATES_FILE, "w") as f:
+        json.dump(aggregates, f)
+
+    print(f"[+] Aggregates for {aggregates['rows']} rows saved to {AGGREGATES_FILE}")
+    return True
+
+
+if __name__ == "__main__":
+    summarize()
@@ -0,0 +1,300 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from PyLog.function import frame_store
+from PyLog.function import progress
+from PyLog.function import records
+
+# ------------------------------------------------
+# Per-IP behaviour over trailing time windows
+# ------------------------------------------------
+# Every request gets features of its source IP's requests in the window
+# ending at it (that request included):
+#   ip_req_per_min     requests in the last RATE_WINDOW seconds
+#   ip_distinct_paths  distinct paths in the last WINDOW seconds
+#   ip_4xx_ratio       share of 4xx responses in the last WINDOW seconds
+#   ip_gap             seconds since the IP's previous request (WINDOW at most)
+#   ip_gap_mean        mean gap between its requests in the last WINDOW seconds
+# Rows without a timestamp (Glaspot lines) get EMPTY.
+WINDOW = 300
+RATE_WINDOW = 60
+
+EMPTY = {
+    "ip_req_per_min": 0,
+    "ip_distinct_paths": 0,
+    "ip_4xx_ratio": 0.0,
+    "ip_gap": WINDOW,
+    "ip_gap_mean": WINDOW,
+}
+
+SCHEMA = pa.schema([
+    ("ip_req_per_min", pa.int32()),
+    ("ip_distinct_paths", pa.int32()),
+    ("ip_4xx_ratio", pa.float32()),
+    ("ip_gap", pa.float32()),
+    ("ip_gap_mean", pa.float32()),
+])
+
+SOURCE_COLUMNS = ["source_ip", "timestamp", "path", "status_code"]
+
+# Window kept between runs for incremental mode. It is only reused while
+# the source logs still hold the bytes the rows done were parsed from (see
+# records.check_source), the code is the same and the last row done still
+# points at the same line
+STATE_FILE = "PyLog/Csv/behavior/state.arrow"
+
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules whose code decides the rows and features already written
+CODE = ["behavior", "records", "parse_log_1"]
+
+
+def requests_of(frame):
+    """
+    The per-request columns the windows need: packed IP, timestamp, a
+    64-bit hash of the path and whether the response was a 4xx.
+    """
+    codes, paths = pd.factorize(frame["path"])
+    # NaN paths (code -1) hash as the "" appended last
+    hashes = pd.util.hash_array(np.array([str(path) for path in paths] + [""], dtype=object))
+    status = frame["status_code"].to_numpy()
+
+    return {
+        "source_ip": frame["source_ip"].to_numpy(dtype=np.uint32),
+        "timestamp": frame["timestamp"].to_numpy(dtype=np.int64),
+        "path": hashes[codes],
+        "is_4xx": (status >= 400) & (status < 500),
+    }
+
+
+def window_features(requests, window=WINDOW, rate_window=RATE_WINDOW):
+    """
+    BEHAVIOR_FEATURES for every row of requests (see requests_of), in a
+    few sorts and cumulative sums, with no per-IP loop.
+
+    Among equal timestamps, earlier rows count as earlier.
+    """
+    n = len(requests["timestamp"])
+    out = {name: np.full(n, value, dtype=SCHEMA.field(name).type.to_pandas_dtype())
+           for name, value in EMPTY.items()}
+
+    timed = np.flatnonzero(requests["timestamp"] != records.NO_TIME)
+    if not len(timed):
+        return pd.DataFrame(out)
+
+    # One sort by (IP, time, row); every window is then a contiguous run
+    ip, ts = requests["source_ip"][timed], requests["timestamp"][timed]
+    order = np.lexsort((timed, ts, ip))
+    rows = timed[order]
+    ip, ts = ip[order], ts[order]
+    path, is_4xx = requests["path"][rows], requests["is_4xx"][rows]
+    m = len(rows)
+    pos = np.arange(m)
+
+    # Window search key: time with gaps over `window`, and IP changes,
+    # shortened to window + 1. Window membership is unchanged and the key
+    # cannot overflow, whatever the timestamps.
+    first = np.r_[True, ip[1:] != ip[:-1]]
+    step = np.minimum(np.diff(ts, prepend=ts[0]), window + 1)
+    key = np.cumsum(np.where(first, window + 1, step))
+
+    start = np.searchsorted(key, key - window, side="right")
+    rate_start = np.searchsorted(key, key - rate_window, side="right")
+    count = pos - start + 1
+
+    errors = np.r_[0, np.cumsum(is_4xx)]
+    gap = np.where(first, window, np.minimum(np.diff(ts, prepend=ts[0]), window))
+    gap_mean = np.where(count > 1, (ts - ts[start]) / np.maximum(count - 1, 1), window)
+
+    # Distinct paths: row j repeats the path of an earlier row p of the
+    # same IP. It is a duplicate in the window of every row i >= j whose
+    # window still reaches back to p, i.e. i < `until` (start only grows).
+    # Rows are grouped by one 64-bit hash of (IP, path), a single sort
+    # instead of a three-key one; the check below still compares both
+    pair = path ^ (ip.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+    by_path = np.argsort(pair, kind="stable")
+    repeat = (ip[by_path][1:] == ip[by_path][:-1]) & (path[by_path][1:] == path[by_path][:-1])
+    j, p = by_path[1:][repeat], by_path[:-1][repeat]
+    until = np.searchsorted(start, p, side="right")
+    live = until > j
+    spans = np.bincount(j[live], minlength=m + 1) - np.bincount(until[live], minlength=m + 1)
+    duplicates = np.cumsum(spans)[:m]
+
+    out["ip_req_per_min"][rows] = pos - rate_start + 1
+    out["ip_distinct_paths"][rows] = count - duplicates
+    out["ip_4xx_ratio"][rows] = (errors[pos + 1] - errors[start]) / count
+    out["ip_gap"][rows] = gap
+    out["ip_gap_mean"][rows] = gap_mean
+    return pd.DataFrame(out)
+
+
+def _concat(a, b):
+    return {name: np.concatenate([a[name], b[name]]) for name in a}
+
+
+class BehaviorWindow:
+    """
+    Incremental mode: takes requests batch by batch in log order and keeps
+    the last `window` seconds of them, so each batch is computed with the
+    history its windows reach into. Memory is bounded by the traffic in
+    one window, not the log size.
+    """
+
+    def __init__(self, window=WINDOW, rate_window=RATE_WINDOW, tail=None):
+        self.window = window
+        self.rate_window = rate_window
+        self.tail = tail
+
+    def update(self, frame):
+        """
+        BEHAVIOR_FEATURES for the rows of frame (SOURCE_COLUMNS).
+        """
+        requests = requests_of(frame)
+        prior = 0
+        if self.tail is not None:
+            prior = len(self.tail["timestamp"])
+            requests = _concat(self.tail, requests)
+
+        features = window_features(requests, self.window, self.rate_window).iloc[prior:]
+
+        ts = requests["timestamp"]
+        timed = ts != records.NO_TIME
+        if timed.any():
+            keep = timed & (ts > ts[timed].max() - self.window)
+            self.tail = {name: values[keep] for name, values in requests.items()}
+
+        return features.reset_index(drop=True)
+
+
+def code_fingerprint():
+    digest = hashlib.sha256()
+    for module in CODE:
+        with open(os.path.join(FUNCTION_DIR, module + ".py"), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _sources():
+    return records.load_sources() if os.path.exists(records.SOURCES_FILE) else []
+
+
+def _same_sources(saved):
+    """
+    True when the logs the saved rows came from are still the first source
+    logs and still hold the bytes they were parsed from.
+    """
+    current = _sources()
+    if not saved or [s["path"] for s in current[:len(saved)]] != [s["path"] for s in saved]:
+        return False
+    try:
+        for source in saved:
+            records.check_source(source)
+    except RuntimeError:
+        return False
+    return True
+
+
+def _last_row(rows):
+    if not rows:
+        return ""
+    last = frame_store.read_row("labeled", rows - 1, records.RAW_COLUMNS)
+    return ",".join(str(last[column]) for column in records.RAW_COLUMNS)
+
+
+def save_state(window, rows, path=STATE_FILE):
+    tail = window.tail or {
+        "source_ip": np.empty(0, dtype=np.uint32),
+        "timestamp": np.empty(0, dtype=np.int64),
+        "path": np.empty(0, dtype=np.uint64),
+        "is_4xx": np.empty(0, dtype=bool),
+    }
+    table = pa.table(tail).replace_schema_metadata({
+        "rows": str(rows),
+        "last_row": _last_row(rows),
+        "sources": json.dumps(_sources()),
+        "code": code_fingerprint(),
+        "window": str(window.window),
+        "rate_window": str(window.rate_window),
+    })
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    feather.write_feather(table, path, compression="uncompressed")
+
+
+def load_state(path=STATE_FILE):
+    """
+    (BehaviorWindow, rows already done) from the last run, or None when
+    there is no usable state: no state, other windows or code, source logs
+    that were replaced, or labeled no longer starts with the rows that were
+    done.
+    """
+    if not os.path.exists(path):
+        return None
+
+    table = feather.read_table(path)
+    meta = table.schema.metadata or {}
+    if int(meta[b"window"]) != WINDOW or int(meta[b"rate_window"]) != RATE_WINDOW:
+        return None
+    if meta.get(b"code", b"").decode() != code_fingerprint():
+        return None
+    if not _same_sources(json.loads(meta.get(b"sources", b"[]"))):
+        return None
+
+    rows = int(meta[b"rows"])
+    if rows > frame_store.num_rows("labeled") or _last_row(rows) != meta[b"last_row"].decode():
+        return None
+
+    tail = {name: table[name].to_numpy() for name in table.column_names}
+    return BehaviorWindow(tail=tail), rows
+
+
+def behavior(incremental=True):
+    """
+    Writes BEHAVIOR_FEATURES for every labeled row, one record batch at a
+    time. In incremental mode, when labeled only gained rows at the end
+    since the last run, those rows alone are computed and appended.
+    """
+    out_file = frame_store.path_of("behavior")
+    total = frame_store.num_rows("labeled")
+    frame_store.discard("behavior")
+
+    state = load_state() if incremental and os.path.exists(out_file) else None
+    if state is not None and frame_store.num_rows("behavior") != state[1]:
+        state = None
+    window, done = state or (BehaviorWindow(), 0)
+
+    tmp = out_file + ".tmp"
+    rows = 0
+    with frame_store.open_writer(tmp, SCHEMA) as writer:
+        if done:
+            # Keep the rows computed last time
+            with pa.memory_map(out_file) as source:
+                reader = pa.ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    writer.write_batch(reader.get_batch(i))
+
+        for frame in frame_store.iter_frames("labeled", columns=SOURCE_COLUMNS):
+            skip = min(max(done - rows, 0), len(frame))
+            rows += len(frame)
+            if skip == len(frame):
+                continue
+            features = window.update(frame.iloc[skip:])
+            writer.write_batch(pa.RecordBatch.from_pandas(features, schema=SCHEMA, preserve_index=False))
+            progress.report(rows, total)
+            progress.check()
+
+    os.replace(tmp, out_file)
+    save_state(window, rows)
+
+    new = rows - done
+    print(f"[+] behavior.arrow created ({rows} rows, {new} computed)")
+    return True
+
+
+if __name__ == "__main__":
+    behavior(incremental=False)
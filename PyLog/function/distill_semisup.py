@@ -0,0 +1,315 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from PyLog.function import frame_store
+from PyLog.function import model_registry
+from PyLog.function import predict_semisup_5
+from PyLog.function import train_semisup_4
+from PyLog.function.tree_ensemble import TreeEnsemble
+
+# ------------------------------------------------
+# Serving model distilled from the semi-supervised one
+# ------------------------------------------------
+# Label spreading keeps every training row and predicts by comparing new
+# rows against them. The student is a small tree forest fitted on the raw
+# (unscaled) features to reproduce the teacher's labels; it is registered
+# under MODEL_NAME, keyed by the teacher it was made from, together with a
+# NumPy export (TREES_FILE) and a fidelity report (FIDELITY_FILE).
+MODEL_NAME = "semisup_distilled"
+TREES_FILE = "trees.npz"
+FIDELITY_FILE = "fidelity.json"
+
+N_TREES = 8
+
+# Transfer set: the teacher's training rows with their transductive labels,
+# plus the distinct feature rows of the current log and SYNTHETIC_ROWS rows
+# drawn feature by feature from the values seen, labeled by the teacher.
+# HOLDOUT of the teacher-labeled rows are kept out for the report.
+SYNTHETIC_ROWS = 20000
+HOLDOUT = 0.2
+SEED = 600
+
+# Rows predicted single-threaded to time the per-row cost
+TIMING_ROWS = 2000
+
+# Fresh interpreters per model for the load time (best of), which then
+# includes the libraries unpickling it imports. Only measured by
+# load_times() (run from the command line), not in the pipeline.
+LOAD_RUNS = 1
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_LOAD = """
+import sys, time
+began = time.perf_counter()
+{load}
+print(time.perf_counter() - began, "sklearn" in sys.modules)
+"""
+
+# load() returns the NumPy export rather than the scikit-learn forest
+NUMPY_PREDICT = True
+
+
+def teacher_points(model):
+    """
+    The scaled training rows of a fitted teacher: sklearn's LabelSpreading
+    keeps them as X_, KNNLabelSpreading in its neighbour index.
+    """
+    if hasattr(model, "X_"):
+        return np.asarray(model.X_, dtype=np.float64)
+    return np.asarray(model.nn_._fit_X, dtype=np.float64)
+
+
+def find(teacher_id=None):
+    """
+    The distilled version made from teacher_id (default: the semi-supervised
+    model load() returns now), or None.
+    """
+    if teacher_id is None:
+        teacher_id = model_registry.current_id(train_semisup_4.MODEL_NAME)
+
+    for version in reversed(model_registry.versions(MODEL_NAME)):
+        if model_registry.metadata(MODEL_NAME, version)["fingerprint"] == teacher_id:
+            return version
+    return None
+
+
+def load(numpy=NUMPY_PREDICT):
+    """
+    (model, meta) distilled from the current semi-supervised model, or None
+    when it has not been distilled yet. Both models take raw features (no
+    scaler); the NumPy one loads and predicts without scikit-learn.
+    """
+    version = find()
+    if version is None:
+        return None
+
+    if numpy:
+        trees = TreeEnsemble.load(model_registry.version_file(MODEL_NAME, version, TREES_FILE))
+        return trees, model_registry.metadata(MODEL_NAME, version)
+    return model_registry.load(MODEL_NAME, version)
+
+
+def _cold_load(load, runs=LOAD_RUNS):
+    """
+    (best ms, whether scikit-learn got imported) for the load statement,
+    (None, None) when the interpreter cannot be run (e.g. a frozen app).
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    best = None
+    try:
+        for _ in range(runs):
+            out = subprocess.run(
+                [sys.executable, "-W", "ignore", "-c", _LOAD.format(load=load)],
+                env=env, capture_output=True, text=True, check=True
+            )
+            seconds, sklearn = out.stdout.split()
+            best = float(seconds) if best is None else min(best, float(seconds))
+    except (OSError, ValueError, subprocess.CalledProcessError) as e:
+        print(f"[!] Load timing failed: {e}")
+        return None, None
+    return round(best * 1000, 1), sklearn == "True"
+
+
+def _per_row_us(predict, X):
+    began = time.perf_counter()
+    predict(X)
+    return round((time.perf_counter() - began) / max(len(X), 1) * 1e6, 3)
+
+
+def _agreement(a, b, weights=None):
+    if len(a) == 0:
+        return None
+    return round(float(np.average(a == b, weights=weights)), 6)
+
+
+def report(version=None):
+    """
+    The fidelity report of a distilled version (default: the current one).
+    """
+    version = version or find()
+    if version is None:
+        return None
+    with open(model_registry.version_file(MODEL_NAME, version, FIDELITY_FILE)) as f:
+        return json.load(f)
+
+
+def load_times(version=None):
+    """
+    Times loading the teacher, the student and the NumPy export of a
+    distilled version (default: the current one) in fresh interpreters and
+    adds the result to its fidelity report.
+    """
+    version = version or find()
+    if version is None:
+        print("[!] No distilled model to time")
+        return None
+
+    fidelity = report(version)
+    teacher_version = int(fidelity["teacher"].split(":")[1][1:])
+    files = {
+        "teacher": model_registry.version_file(train_semisup_4.MODEL_NAME, teacher_version, "model.joblib"),
+        "student": model_registry.version_file(MODEL_NAME, version, "model.joblib"),
+    }
+    loads = {name: _cold_load(f"import joblib; joblib.load({path!r}, mmap_mode='r')") for name, path in files.items()}
+    trees_file = model_registry.version_file(MODEL_NAME, version, TREES_FILE)
+    loads["numpy"] = _cold_load(f"from PyLog.function.tree_ensemble import TreeEnsemble; TreeEnsemble.load({trees_file!r})")
+
+    fidelity["load_ms"] = {name: ms for name, (ms, _) in loads.items()}
+    fidelity["imports_sklearn"] = {name: sklearn for name, (_, sklearn) in loads.items()}
+    with open(model_registry.version_file(MODEL_NAME, version, FIDELITY_FILE), "w") as f:
+        json.dump(fidelity, f, indent=2)
+
+    for name, ms in fidelity["load_ms"].items():
+        print(f"[+] {name}: load " + ("n/a" if ms is None else f"{ms:.1f} ms"))
+    return fidelity["load_ms"]
+
+
+def distill(force=False):
+    """
+    Distils the current semi-supervised model, unless that was done already.
+    """
+    train_semisup_4.import_legacy()
+    teacher_id = model_registry.current_id(train_semisup_4.MODEL_NAME)
+    if not force and find(teacher_id) is not None:
+        print("[+] Distilled model is current, distillation skipped")
+        return True
+
+    # scikit-learn is only loaded when a student is actually fitted
+    from sklearn.ensemble import RandomForestClassifier
+
+    bundle, meta = model_registry.load(train_semisup_4.MODEL_NAME)
+    teacher, scaler = bundle["model"], bundle["scaler"]
+    features = meta["features"]
+
+    def teach(X):
+        return predict_semisup_5.run_batches(teacher, np.ascontiguousarray(scaler.transform(X)))[0]
+
+    #  TRANSFER SET
+    known = scaler.inverse_transform(teacher_points(teacher))
+    known_labels = np.asarray(teacher.transduction_)
+
+    observed = np.empty((0, len(features)))
+    counts = np.empty(0, dtype=np.int64)
+    if frame_store.exists("features"):
+        values = frame_store.load("features", columns=features).fillna(0).values.astype(np.float64)
+        observed, counts = np.unique(values, axis=0, return_counts=True)
+
+    rng = np.random.default_rng(SEED)
+    seen = np.vstack([known, observed])
+    synthetic = np.column_stack([
+        rng.choice(np.unique(seen[:, j]), SYNTHETIC_ROWS) for j in range(len(features))
+    ])
+
+    taught = np.vstack([observed, synthetic])
+    taught_labels = teach(taught)
+    held = rng.random(len(taught)) < HOLDOUT
+
+    #  FIT THE STUDENT
+    student = RandomForestClassifier(
+        n_estimators=N_TREES,
+        max_features=None,
+        n_jobs=-1,
+        random_state=SEED
+    )
+    student.fit(np.vstack([known, taught[~held]]), np.r_[known_labels, taught_labels[~held]])
+    # Serving predicts small batches, one scorer thread each
+    student.set_params(n_jobs=1)
+    trees = TreeEnsemble.from_sklearn(student)
+
+    #  FIDELITY
+    predicted = student.predict(taught)
+
+    def on_log(rows):
+        """
+        Agreement on the distinct log rows selected, weighted by how often
+        each occurs in the log.
+        """
+        weights = counts[rows]
+        return {
+            "rows": int(weights.sum()),
+            "distinct": int(rows.sum()),
+            "agreement": _agreement(predicted[:len(observed)][rows], taught_labels[:len(observed)][rows],
+                                    weights if weights.sum() else None),
+        }
+
+    # Log rows the student was not fitted on are the fidelity figure; the
+    # rest is reported separately, like teacher_training
+    log_held = held[:len(observed)]
+    classes = {
+        str(label): {
+            "rows": int(np.sum(taught_labels[held] == label)),
+            "agreement": _agreement(predicted[held][taught_labels[held] == label], label),
+        }
+        for label in np.unique(taught_labels[held])
+    }
+    timing = synthetic[:TIMING_ROWS]
+    teacher_timing = np.ascontiguousarray(scaler.transform(timing))
+    fidelity = {
+        "teacher": teacher_id,
+        "training_rows": {"teacher": len(known), "taught": int(np.sum(~held))},
+        "holdout": {
+            "rows": int(np.sum(held)),
+            "agreement": _agreement(predicted[held], taught_labels[held]),
+            "classes": classes,
+        },
+        "log": on_log(log_held),
+        "log_training": on_log(~log_held),
+        "teacher_training": {
+            "rows": len(known),
+            "agreement": _agreement(student.predict(known), known_labels),
+        },
+        "numpy_matches_sklearn": bool(np.array_equal(trees.predict(taught), predicted)),
+        "student": {"trees": trees.n_trees, "nodes": trees.n_nodes, "depth": trees.depth},
+        "predict_us_per_row": {
+            "teacher": _per_row_us(teacher.predict, teacher_timing),
+            "student": _per_row_us(student.predict, timing),
+            "numpy": _per_row_us(trees.predict, timing),
+        },
+    }
+
+    version = model_registry.register(
+        MODEL_NAME,
+        student,
+        features,
+        teacher_id,
+        meta.get("stats"),
+        params={
+            "teacher": teacher_id,
+            "n_trees": N_TREES,
+            "synthetic_rows": SYNTHETIC_ROWS,
+            "holdout": HOLDOUT,
+        }
+    )
+    trees_file = model_registry.version_file(MODEL_NAME, version, TREES_FILE)
+    trees.save(trees_file)
+
+    teacher_file = model_registry.version_file(train_semisup_4.MODEL_NAME, meta["version"], "model.joblib")
+    student_file = model_registry.version_file(MODEL_NAME, version, "model.joblib")
+    fidelity["bytes"] = {
+        "teacher": os.path.getsize(teacher_file),
+        "student": os.path.getsize(student_file),
+        "numpy": os.path.getsize(trees_file),
+    }
+    with open(model_registry.version_file(MODEL_NAME, version, FIDELITY_FILE), "w") as f:
+        json.dump(fidelity, f, indent=2)
+
+    holdout, log = fidelity["holdout"], fidelity["log"]
+    print(f"[+] Semi-supervised model v{meta['version']} distilled (v{version}, "
+          f"{trees.n_trees} trees, {trees.n_nodes} nodes)")
+    print(f"[+] Fidelity: {holdout['agreement']:.2%} of {holdout['rows']} held-out rows"
+          + (f", {log['agreement']:.2%} of {log['rows']} held-out log rows" if log["agreement"] is not None else ""))
+    for name in ("teacher", "student", "numpy"):
+        print(f"[+] {name}: {fidelity['bytes'][name] / 1024:.1f} KiB, "
+              f"{fidelity['predict_us_per_row'][name]:.2f} us/row")
+    return True
+
+
+if __name__ == "__main__":
+    distill(force=True)
+    load_times()
@@ -1,49 +1,149 @@
+import numpy as np
 import pandas as pd
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 
-INPUT_FILE = "data/output/final_output.csv"
+from PyLog.function import frame_store
+
 REPORT_FILE = "data/output/evaluation_summary.csv"
 
 ATTACK_LABELS = [5, 8, 9]   # XSS, CMDi, SQLi
+CM_LABELS = [0, 5, 8, 9]
+
+# Points added to risk_score by each signal
+RISK_WEIGHTS = {
+    "attack": 5,        # Semantic attack
+    "anomaly": 3,       # Behavioral anomaly
+    "aggressive": 2,    # Aggressive source
+}
+AGGRESSIVE_FREQ = 2     # freq_label at or above this counts as aggressive
+
+# (minimum risk_score, alert level), highest first
+ALERT_LEVELS = [(7, "high"), (5, "medium")]
 
+# Only the columns evaluation needs are read, one record batch at a time
+EVAL_COLUMNS = ["label", "predicted_label", "behavior_anomaly", "freq_label"]
 
-def calculate_risk(row):
+
+def calculate_risk(row, weights=None):
+    if weights is None:
+        weights = RISK_WEIGHTS
     score = 0
 
     # Semantic attack
     if row["predicted_label"] in ATTACK_LABELS:
-        score += 5
+        score += weights["attack"]
 
     # Behavioral anomaly
     if row["behavior_anomaly"] == -1:
-        score += 3
+        score += weights["anomaly"]
 
     # Aggressive source
-    if row["freq_label"] >= 2:
-        score += 2
+    if row["freq_label"] >= AGGRESSIVE_FREQ:
+        score += weights["aggressive"]
 
     return score
 
 
-def main():
-    print("======== Loading Output CSV ========")
-    df = pd.read_csv(INPUT_FILE)
+def risk_scores(df, weights=None):
+    """
+    calculate_risk over whole columns.
+    """
+    if weights is None:
+        weights = RISK_WEIGHTS
+
+    attack = df["predicted_label"].isin(ATTACK_LABELS).to_numpy()
+    anomaly = (df["behavior_anomaly"] == -1).to_numpy()
+    aggressive = (df["freq_label"] >= AGGRESSIVE_FREQ).to_numpy()
+
+    return (
+        attack * weights["attack"]
+        + anomaly * weights["anomaly"]
+        + aggressive * weights["aggressive"]
+    )
+
+
+def threat_types(df):
+    return np.select(
+        [
+            df["predicted_label"].isin(ATTACK_LABELS).to_numpy(),
+            (df["behavior_anomaly"] == -1).to_numpy()
+        ],
+        ["attack", "recon"],
+        default="normal"
+    )
+
+
+def alert_levels(risk):
+    risk = np.asarray(risk)
+    return np.select(
+        [risk >= minimum for minimum, _ in ALERT_LEVELS],
+        [level for _, level in ALERT_LEVELS],
+        default="none"
+    )
+
+
+def score_frame(df, weights=None):
+    """
+    Adds risk_score, threat_type and alert_level columns in place.
+    """
+    df["risk_score"] = risk_scores(df, weights)
+    df["threat_type"] = threat_types(df)
+    df["alert_level"] = alert_levels(df["risk_score"].to_numpy())
+    return df
+
+
+def accumulate(frames, weights=None):
+    """
+    Folds record batches into the counts every metric below is built from.
+    """
+    totals = {"total": 0, "unlabeled": 0, "unlabeled_attacks": 0, "high": 0}
+    pairs = None
+
+    for df in frames:
+        totals["total"] += len(df)
+
+        known = (df["label"] != -1).to_numpy()
+        predicted_attack = df["predicted_label"].isin(ATTACK_LABELS).to_numpy()
+
+        totals["unlabeled"] += int((~known).sum())
+        totals["unlabeled_attacks"] += int((predicted_attack & ~known).sum())
+
+        risk = risk_scores(df, weights)
+        totals["high"] += int((alert_levels(risk) == "high").sum())
+
+        # (true label, predicted label) -> row count, for known rows only
+        batch_pairs = df.loc[known, ["label", "predicted_label"]].value_counts()
+        pairs = batch_pairs if pairs is None else pairs.add(batch_pairs, fill_value=0)
+
+    if pairs is None:
+        pairs = pd.Series(dtype="int64")
+    return totals, pairs.astype("int64")
+
+
+def main(weights=None):
+    from sklearn.metrics import classification_report
+
+    print("======== Loading Final Output ========")
+    totals, pairs = accumulate(frame_store.iter_frames("final_output", columns=EVAL_COLUMNS), weights)
+
+    if len(pairs):
+        y_true = pairs.index.get_level_values(0).to_numpy()
+        y_pred = pairs.index.get_level_values(1).to_numpy()
+    else:
+        y_true = y_pred = np.zeros(0, dtype=np.int64)
+    counts = pairs.to_numpy()
 
     # ------------------------------------------------
     # 1. Filter rows with known ground truth
     # ------------------------------------------------
-    df_known = df[df["label"] != -1]
+    known_rows = int(counts.sum())
 
-    print(f"[+] Known-label rows: {len(df_known)}")
-    print(f"[+] Unlabeled rows: {len(df) - len(df_known)}")
+    print(f"[+] Known-label rows: {known_rows}")
+    print(f"[+] Unlabeled rows: {totals['unlabeled']}")
 
     # ------------------------------------------------
     # 2. Basic accuracy (sanity check)
     # ------------------------------------------------
-    accuracy = accuracy_score(
-        df_known["label"],
-        df_known["predicted_label"]
-    )
+    accuracy = counts[y_true == y_pred].sum() / known_rows if known_rows else float("nan")
 
     print("\n======== Basic Accuracy ========")
     print("Accuracy:", round(accuracy, 4))
@@ -52,28 +152,29 @@ def main():
     # 3. Classification report
     # ------------------------------------------------
     print("\n======== Classification Report ========")
-    print(
-        classification_report(
-            df_known["label"],
-            df_known["predicted_label"],
-            zero_division=0
+    if known_rows:
+        print(
+            classification_report(
+                y_true,
+                y_pred,
+                sample_weight=counts,
+                zero_division=0
+            )
         )
-    )
 
     # ------------------------------------------------
     # 4. Confusion Matrix
     # ------------------------------------------------
     print("\n======== Confusion Matrix ========")
-    cm = confusion_matrix(
-        df_known["label"],
-        df_known["predicted_label"],
-        labels=[0, 5, 8, 9]
-    )
+    cm = np.zeros((len(CM_LABELS), len(CM_LABELS)), dtype=np.int64)
+    for (true, pred), count in pairs.items():
+        if true in CM_LABELS and pred in CM_LABELS:
+            cm[CM_LABELS.index(true), CM_LABELS.index(pred)] += count
 
     cm_df = pd.DataFrame(
         cm,
-        index=["true_0", "true_5", "true_8", "true_9"],
-        columns=["pred_0", "pred_5", "pred_8", "pred_9"]
+        index=[f"true_{label}" for label in CM_LABELS],
+        columns=[f"pred_{label}" for label in CM_LABELS]
     )
 
     print(cm_df)
@@ -81,64 +182,45 @@ def main():
     # ------------------------------------------------
     # 5. Attack recall (MODEL QUALITY, NOT ALERTING)
     # ------------------------------------------------
-    df_attacks = df_known[df_known["label"].isin(ATTACK_LABELS)]
+    true_attack = np.isin(y_true, ATTACK_LABELS)
+    attack_rows = counts[true_attack].sum()
 
     attack_recall = (
-        df_attacks["predicted_label"].isin(ATTACK_LABELS)
-    ).mean()
+        counts[true_attack & np.isin(y_pred, ATTACK_LABELS)].sum() / attack_rows
+        if attack_rows else float("nan")
+    )
 
     print("\n======== Attack Recall ========")
     print("Attack recall:", round(attack_recall, 4))
 
     # ------------------------------------------------
-    # 6. Risk scoring + threat type
+    # 6. ML discovery on previously unlabeled data
     # ------------------------------------------------
-    df["risk_score"] = df.apply(calculate_risk, axis=1)
-
-    df["threat_type"] = "normal"
-    df.loc[df["behavior_anomaly"] == -1, "threat_type"] = "recon"
-    df.loc[df["predicted_label"].isin(ATTACK_LABELS), "threat_type"] = "attack"
-
-    # ------------------------------------------------
-    # 7. Alert level (SOC-style tiers)
-    # ------------------------------------------------
-    df["alert_level"] = "none"
-    df.loc[df["risk_score"] >= 7, "alert_level"] = "high"
-    df.loc[
-        (df["risk_score"] >= 5) & (df["risk_score"] < 7),
-        "alert_level"
-    ] = "medium"
-
-    # ------------------------------------------------
-    # 8. ML discovery on previously unlabeled data
-    # ------------------------------------------------
-    df_unknown = df[df["label"] == -1].copy()
-    df_unknown["ml_attack"] = df_unknown["predicted_label"].isin(ATTACK_LABELS)
-
-    discovery_rate = df_unknown["ml_attack"].mean()
+    discovery_rate = (
+        totals["unlabeled_attacks"] / totals["unlabeled"]
+        if totals["unlabeled"] else float("nan")
+    )
 
     print("\n======== Discovery on Unlabeled Data ========")
     print("ML flagged attacks:", round(discovery_rate * 100, 2), "%")
 
     # ------------------------------------------------
-    # 9. High-confidence alerts
+    # 7. High-confidence alerts (risk score + alert tiers)
     # ------------------------------------------------
-    high_confidence = df[df["alert_level"] == "high"]
-
     print("\n======== High-Confidence Alerts ========")
-    print("Count:", len(high_confidence))
+    print("Count:", totals["high"])
 
     # ------------------------------------------------
-    # 10. Save evaluation summary
+    # 8. Save evaluation summary
     # ------------------------------------------------
     summary = {
-        "total_rows": len(df),
-        "known_rows": len(df_known),
-        "unlabeled_rows": len(df_unknown),
+        "total_rows": totals["total"],
+        "known_rows": known_rows,
+        "unlabeled_rows": totals["unlabeled"],
         "accuracy": accuracy,
         "attack_recall": attack_recall,
         "unlabeled_attack_rate": discovery_rate,
-        "high_confidence_alerts": len(high_confidence)
+        "high_confidence_alerts": totals["high"]
     }
 
     summary_df = pd.DataFrame([summary])
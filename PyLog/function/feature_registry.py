@@ -0,0 +1,70 @@
+import json
+import os
+
+# ------------------------------------------------
+# Single source of truth for the feature columns
+# used by features_3, behavior, train_semisup_4,
+# predict_semisup_5 and train_iforest_6
+# ------------------------------------------------
+
+# Derived from the request path, in column order
+PATH_FEATURES = [
+    "path_len",
+    "path_depth",
+    "has_query",
+    "has_values",
+    "is_php",
+    "is_static"
+]
+
+# Produced by features_3
+FEATURES = ["method_enc"] + PATH_FEATURES
+
+# Layout of features_semisup.csv
+FEATURE_TABLE = FEATURES + ["label", "freq_label"]
+
+# Inputs of the semi-supervised model (matches the saved scaler)
+SEMISUP_FEATURES = FEATURES + ["freq_label"]
+
+# Per-IP windowed behaviour, produced by behavior
+BEHAVIOR_FEATURES = [
+    "ip_req_per_min",
+    "ip_distinct_paths",
+    "ip_4xx_ratio",
+    "ip_gap",
+    "ip_gap_mean"
+]
+
+# Inputs of the behavioural IsolationForest
+IFOREST_FEATURES = [
+    "path_len",
+    "path_depth",
+    "has_query",
+    "has_values",
+    "label",
+    "predicted_label",
+    "is_static",
+    "freq_label"
+] + BEHAVIOR_FEATURES
+
+# ------------------------------------------------
+# HTTP method vocabulary
+# ------------------------------------------------
+# Fixed so method_enc means the same thing on every run.
+# Missing or unknown methods map to "NONE".
+METHOD_VOCAB = ["GET", "POST", "HEAD", "PUT", "DELETE", "NONE"]
+METHOD_VOCAB_FILE = "PyLog/Model/method_vocab.json"
+
+
+def load_method_vocab(path=METHOD_VOCAB_FILE):
+    """
+    Returns the persisted method vocabulary, writing the default on first use.
+    """
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(METHOD_VOCAB, f, indent=2)
+    return list(METHOD_VOCAB)
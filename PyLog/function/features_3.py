@@ -1,36 +1,91 @@
+from itertools import chain
+
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
 
+from PyLog.function import frame_store
+from PyLog.function import path_memo
+from PyLog.function import prepare_labels_2
+from PyLog.function import progress
+from PyLog.function.feature_registry import FEATURES, FEATURE_TABLE, load_method_vocab
+
+
+STATIC_EXTENSIONS = (".css", ".js", ".png", ".jpg")
+
+
+def path_features(path):
+    """
+    All path features for one path, in feature_registry.PATH_FEATURES order.
+    """
+    return (
+        len(path),
+        path.count("/"),
+        "?" in path or "%27" in path or "--" in path,
+        "=" in path,
+        ".php" in path,
+        any(ext in path for ext in STATIC_EXTENSIONS)
+    )
+
+
+def path_matrix(paths):
+    """
+    (len(paths) x PATH_FEATURES) matrix for a list of path strings.
+    """
+    flat = np.fromiter(
+        chain.from_iterable(map(path_features, paths)),
+        dtype=np.int64,
+        count=len(paths) * (len(FEATURES) - 1)
+    )
+    return flat.reshape(len(paths), len(FEATURES) - 1)
+
+
+def encode_methods(methods, vocab):
+    """
+    Maps HTTP methods onto the fixed vocabulary; unknown values become NONE.
+    """
+    codes = {method: i for i, method in enumerate(vocab)}
+    # Once per distinct method; NaN (code -1) takes the NONE appended last
+    rows, methods = pd.factorize(methods)
+    upper = pd.Series(np.asarray(methods, dtype=object)).astype(str).str.upper()
+    mapped = upper.map(codes).fillna(codes["NONE"]).to_numpy(dtype=np.int64)
+    return np.append(mapped, codes["NONE"])[rows]
+
+
+def extract(frame, vocab=None, memo=None):
+    """
+    Builds the (rows x FEATURES) matrix, reading each distinct path once,
+    or only the paths memo (a path_memo.PathMemo) has not seen.
+    """
+    if vocab is None:
+        vocab = load_method_vocab()
+
+    out = np.empty((len(frame), len(FEATURES)), dtype=np.int64)
+    out[:, 0] = encode_methods(frame["http_method"], vocab)
+
+    # NaN paths (code -1) read as the "" appended last
+    rows, paths = pd.factorize(frame["path"])
+    paths = [str(path) for path in paths]
+    if memo is None:
+        matrix = path_matrix(paths + [""])
+    else:
+        matrix = np.vstack([memo.lookup(paths)[1], path_matrix([""])])
+    out[:, 1:] = matrix[rows]
+
+    return out
 
 
 def features():
-    df = pd.read_csv("PyLog/Csv/labeled/labeled.csv")
-
-    # Encode HTTP method
-    le = LabelEncoder()
-    df["method_enc"] = le.fit_transform(df["http_method"].fillna("NONE"))
-
-    df["path_len"] = df["path"].fillna("").apply(len)
-    df["path_depth"] = df["path"].fillna("").str.count("/")
-    df["has_query"] = df["path"].fillna("").str.contains(r"\?|%27|--", regex=True).astype(int)
-    df["has_values"] = df["path"].fillna("").str.contains("=").astype(int)
-    df["is_php"] = df["path"].fillna("").str.contains(".php", regex=False).astype(int)
-    df["is_static"] = df["path"].fillna("").str.contains(r"\.css|\.js|\.png|\.jpg", regex=True).astype(int)
-
-    features = df[
-        [
-            "method_enc",
-            "path_len",
-            "path_depth",
-            "has_query",
-            "has_values",
-            "is_php",
-            "is_static",
-            "label",
-            "freq_label"
-        ]
-    ]
-
-    features.to_csv("PyLog/Csv/features_semisup/features_semisup.csv", index=False)
-    print("[+] features.csv created")
+    df = frame_store.load("labeled", columns=["http_method", "path", "label", "freq_label"])
+
+    memo = path_memo.shared(prepare_labels_2.label_frame)
+    matrix = extract(df, memo=memo)
+    memo.save()
+    progress.report(len(df), len(df))
+
+    features = pd.DataFrame(matrix, columns=FEATURES)
+    features["label"] = df["label"].to_numpy()
+    features["freq_label"] = df["freq_label"].to_numpy()
+
+    frame_store.save("features", features[FEATURE_TABLE])
+    print("[+] features_semisup.arrow created")
     return True
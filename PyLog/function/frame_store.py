@@ -0,0 +1,265 @@
+import os
+import sys
+
+from PyLog.function.lazy import lazy_import
+
+# Loaded on first use: path lookups stay cheap for entry points
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+records = lazy_import("PyLog.function.records")
+
+# ------------------------------------------------
+# Typed columnar hand-off between pipeline phases
+# ------------------------------------------------
+# Intermediates are stored as uncompressed Arrow IPC files so the next
+# phase can memory-map them instead of re-parsing CSV text.
+ARTIFACTS = {
+    "parsed": "PyLog/Csv/parsed/parsed.arrow",
+    "labeled": "PyLog/Csv/labeled/labeled.arrow",
+    "behavior": "PyLog/Csv/behavior/behavior.arrow",
+    "features": "PyLog/Csv/features_semisup/features_semisup.arrow",
+    "semisup_output": "data/output/semisup_output.arrow",
+    "final_output": "data/output/final_output.arrow",
+}
+
+# When True, save() also keeps the frame so a later load() in the same
+# process skips the disk read entirely.
+KEEP_IN_MEMORY = False
+
+_memory = {}
+
+
+def path_of(name):
+    return ARTIFACTS[name]
+
+
+def csv_path_of(name):
+    return os.path.splitext(ARTIFACTS[name])[0] + ".csv"
+
+
+def exists(name):
+    return name in _memory or os.path.exists(path_of(name))
+
+
+def save(name, frame):
+    """
+    Writes a phase output and, in KEEP_IN_MEMORY mode, keeps it for load().
+    """
+    path = path_of(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    import pyarrow.feather as feather
+
+    frame = frame.reset_index(drop=True)
+    feather.write_feather(frame, path, compression="uncompressed")
+
+    if KEEP_IN_MEMORY:
+        _memory[name] = frame
+    else:
+        _memory.pop(name, None)
+
+
+def _to_pandas(data):
+    """
+    Arrow table or record batch -> DataFrame, with records.TEXT_COLUMNS
+    dictionary-encoded so they load as categoricals.
+    """
+    import pyarrow.compute as pc
+
+    for name in records.TEXT_COLUMNS:
+        i = data.schema.get_field_index(name)
+        if i >= 0 and pa.types.is_string(data.schema.field(i).type):
+            data = data.set_column(i, name, pc.dictionary_encode(data.column(i)))
+    return data.to_pandas()
+
+
+def load(name, columns=None):
+    """
+    Returns a phase output as a DataFrame, memory-mapping the Arrow file.
+    """
+    if name in _memory:
+        frame = _memory[name]
+        # Shallow copy so callers can add columns without touching the store
+        return frame.copy(deep=False) if columns is None else frame[columns].copy()
+
+    import pyarrow.feather as feather
+
+    table = feather.read_table(path_of(name), columns=columns, memory_map=True)
+    return _to_pandas(table)
+
+
+def num_rows(name):
+    if name in _memory:
+        return len(_memory[name])
+
+    with pa.memory_map(path_of(name)) as source:
+        reader = pa.ipc.open_file(source)
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+
+def read_row(name, index, columns=None):
+    """
+    One row of a phase output as a dict, without loading the others.
+    """
+    if name in _memory:
+        frame = _memory[name]
+        frame = frame if columns is None else frame[columns]
+        return frame.iloc[index].to_dict()
+
+    import pyarrow.feather as feather
+
+    table = feather.read_table(path_of(name), columns=columns, memory_map=True)
+    return table.slice(index, 1).to_pylist()[0]
+
+
+def iter_frames(name, columns=None):
+    """
+    Yields a phase output one record batch at a time.
+    """
+    if name in _memory:
+        frame = _memory[name]
+        yield frame if columns is None else frame[columns]
+        return
+
+    with pa.memory_map(path_of(name)) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            yield _to_pandas(batch)
+
+
+def iter_aligned(sources, chunk_rows=1_000_000):
+    """
+    Yields row-aligned chunks of several outputs side by side.
+
+    sources maps artifact name -> columns; each chunk is one DataFrame with
+    all requested columns for the same row range. The outputs must have the
+    same number of rows (phases keep row order, so they do).
+    """
+    import pyarrow.feather as feather
+
+    tables = {}
+    for name, columns in sources.items():
+        if name in _memory:
+            tables[name] = _memory[name][columns]
+        else:
+            tables[name] = feather.read_table(path_of(name), columns=columns, memory_map=True)
+
+    sizes = {len(table) for table in tables.values()}
+    if len(sizes) > 1:
+        raise ValueError(f"Outputs are not row-aligned: {sorted(sizes)}")
+    total = sizes.pop() if sizes else 0
+
+    for start in range(0, total, chunk_rows):
+        parts = []
+        for table in tables.values():
+            if isinstance(table, pd.DataFrame):
+                parts.append(table.iloc[start:start + chunk_rows].reset_index(drop=True))
+            else:
+                parts.append(_to_pandas(table.slice(start, chunk_rows)))
+        yield pd.concat(parts, axis=1)
+
+
+class _DictionaryWriter:
+    """
+    IPC file writer for schemas with dictionary columns. Batches may each
+    carry their own dictionaries (one per parsed block or shard); they are
+    re-indexed against one growing dictionary per column, so the file only
+    stores each value once and adds new ones as dictionary deltas.
+
+    Meant for low-cardinality columns: the vocabulary of every column is
+    kept for the whole file.
+    """
+
+    def __init__(self, path, schema):
+        self.schema = schema
+        self.writer = pa.ipc.new_file(
+            path, schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        )
+        # column index -> (dictionary array in code order, value -> code)
+        self.vocab = {
+            i: (pa.array([], field.type.value_type), {}) for i, field in enumerate(schema)
+            if pa.types.is_dictionary(field.type)
+        }
+
+    def _unify(self, i, column):
+        dictionary, codes = self.vocab[i]
+        value_type = self.schema.field(i).type
+        mapping = []
+        new = []
+        for value in column.dictionary.to_pylist():
+            if value not in codes:
+                codes[value] = len(dictionary) + len(new)
+                new.append(value)
+            mapping.append(codes[value])
+
+        # Only values first seen in this batch are appended
+        if new:
+            dictionary = pa.concat_arrays([dictionary, pa.array(new, value_type.value_type)])
+            self.vocab[i] = dictionary, codes
+
+        indices = pa.array(mapping, value_type.index_type).take(column.indices)
+        return pa.DictionaryArray.from_arrays(indices, dictionary)
+
+    def write_batch(self, batch):
+        columns = [
+            self._unify(i, column) if i in self.vocab else column
+            for i, column in enumerate(batch.columns)
+        ]
+        self.writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_writer(path, schema):
+    """
+    Opens an Arrow IPC file writer for phases that stream their output.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if any(pa.types.is_dictionary(field.type) for field in schema):
+        return _DictionaryWriter(path, schema)
+    return pa.ipc.new_file(path, schema)
+
+
+def discard(name):
+    _memory.pop(name, None)
+
+
+def clear_memory():
+    _memory.clear()
+
+
+def export_csv(name, out_file=None):
+    """
+    Opt-in CSV export of a stored frame, written batch by batch. Compact
+    record columns (parsed, labeled) are written back as text, raw_log
+    included.
+    """
+    if out_file is None:
+        out_file = csv_path_of(name)
+    os.makedirs(os.path.dirname(out_file) or ".", exist_ok=True)
+
+    with open(out_file, "w", newline="") as f:
+        header = True
+        for frame in iter_frames(name):
+            if "timestamp" in frame or "raw_file" in frame:
+                frame = records.readable(frame)
+            frame.to_csv(f, header=header, index=False)
+            header = False
+
+    print(f"[+] {out_file} exported")
+    return out_file
+
+
+if __name__ == "__main__":
+    # python -m PyLog.function.frame_store final_output [out.csv]
+    export_csv(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,259 @@
+import cProfile
+import collections
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+# ------------------------------------------------
+# Per-phase metrics: wall/CPU time, rows, throughput, peak memory
+# ------------------------------------------------
+METRICS_JSONL = "data/output/phase_metrics.jsonl"
+METRICS_PROM = "data/output/phase_metrics.prom"
+
+# "jsonl", "prometheus", both as a list, or None to skip exporting
+EXPORT = "jsonl"
+
+# None, "cprofile" (deterministic, .prof per phase) or "sample" (stack
+# samples of the main thread, written as folded stacks for flame graphs)
+PROFILE = None
+PROFILE_DIR = "data/output/profiles"
+SAMPLE_INTERVAL = 0.005   # seconds between stack samples
+
+RSS_SAMPLE_INTERVAL = 0.01   # seconds between memory samples
+
+# Prometheus metric name, record field, help text
+PROM_METRICS = [
+    ("pylog_phase_wall_seconds", "wall_s", "Wall-clock time of the phase"),
+    ("pylog_phase_cpu_seconds", "cpu_s", "CPU time of the phase, including worker processes"),
+    ("pylog_phase_rows_in", "rows_in", "Rows read by the phase"),
+    ("pylog_phase_rows_out", "rows_out", "Rows written by the phase"),
+    ("pylog_phase_rows_per_second", "rows_per_s", "Phase throughput"),
+    ("pylog_phase_peak_rss_bytes", "peak_rss", "Peak resident memory of this process during the phase"),
+]
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        # No procfs: fall back to the process high-water mark
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _cpu_seconds():
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+class PeakRSS:
+    """
+    Samples this process's resident set size while the block runs.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+        return False
+
+
+class StackSampler:
+    """
+    Counts the call stacks of one thread at a fixed interval.
+    """
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def write_folded(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def _profiled(name, profile):
+    if not profile:
+        yield
+        return
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+
+    if profile == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(PROFILE_DIR, f"{name}.prof"))
+        return
+
+    if profile == "sample":
+        with StackSampler() as sampler:
+            yield
+        sampler.write_folded(os.path.join(PROFILE_DIR, f"{name}.folded"))
+        return
+
+    raise ValueError(f"unknown profile mode: {profile}")
+
+
+@contextmanager
+def measure(name, rows_in=None, profile=None):
+    """
+    Times the block and yields its metrics record.
+
+    The caller may set record["rows_out"] (and rows_in) inside the block;
+    rows_per_s is filled in on exit from whichever is larger.
+    """
+    if profile is None:
+        profile = PROFILE
+
+    record = {
+        "phase": name,
+        "started": time.time(),
+        "rows_in": rows_in,
+        "rows_out": None,
+    }
+
+    cpu = _cpu_seconds()
+    with PeakRSS() as rss, _profiled(name, profile):
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["wall_s"] = time.perf_counter() - start
+
+    record["cpu_s"] = _cpu_seconds() - cpu
+    record["peak_rss"] = rss.peak
+
+    rows = max(r for r in (record["rows_in"], record["rows_out"], 0) if r is not None)
+    record["rows_per_s"] = rows / record["wall_s"] if record["wall_s"] > 0 else None
+
+
+def _compact(value):
+    for limit, suffix in [(1e9, "G"), (1e6, "M"), (1e3, "k")]:
+        if value >= limit:
+            return f"{value / limit:.0f}{suffix}"
+    return f"{value:.0f}"
+
+
+def format_row(record):
+    """
+    One fixed-width line of the per-phase timing table.
+    """
+    return (
+        f"{record['phase'][:8]:<8}{record['wall_s']:>6.1f}{record['cpu_s']:>6.1f}"
+        f"{_compact(record.get('rows_per_s') or 0):>7}{record['peak_rss'] / 1024 ** 2:>5.0f}"
+    )
+
+
+TABLE_HEADER = f"{'phase':<8}{'wall':>6}{'cpu':>6}{'rows/s':>7}{'MB':>5}"
+
+
+def write_jsonl(records, path=METRICS_JSONL):
+    """
+    Appends one JSON line per phase, tagged with a shared run id.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    run_id = time.strftime("%Y%m%dT%H%M%S", time.localtime(records[0]["started"])) if records else None
+    with open(path, "a") as f:
+        for record in records:
+            f.write(json.dumps({"run": run_id, **record}, default=str) + "\n")
+
+
+def write_prometheus(records, path=METRICS_PROM):
+    """
+    Writes the latest run as a Prometheus text file (node_exporter textfile
+    collector format), replacing the previous one atomically.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    lines = []
+    for metric, field, help_text in PROM_METRICS:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for record in records:
+            value = record.get(field)
+            if value is None:
+                continue
+            labels = f'phase="{record["phase"]}"'
+            if record.get("status"):
+                labels += f',status="{record["status"]}"'
+            lines.append(f"{metric}{{{labels}}} {value}")
+
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+
+
+def export(records, formats=None):
+    if formats is None:
+        formats = EXPORT
+    if not formats or not records:
+        return
+    if isinstance(formats, str):
+        formats = [formats]
+
+    for fmt in formats:
+        if fmt == "jsonl":
+            write_jsonl(records)
+        elif fmt == "prometheus":
+            write_prometheus(records)
+        else:
+            raise ValueError(f"unknown metrics format: {fmt}")
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+# ------------------------------------------------
+# Sliding-window per-IP request rates in fixed memory
+# ------------------------------------------------
+WINDOW = 3600        # seconds covered by the window
+BUCKETS = 6          # window granularity: 6 x 10 minutes
+WIDTH = 1 << 18      # counters per sketch row (~30 MB in total)
+DEPTH = 4            # independent hash rows; estimates take the minimum
+
+
+def pack_ips(ips):
+    """
+    Dotted IPv4 strings -> uint32. Missing or malformed addresses become 0.
+    """
+    ips = pd.Series(ips)
+    parts = ips.astype("string").str.split(".", n=3, expand=True)
+    if parts.shape[1] < 4:
+        return np.zeros(len(ips), dtype=np.uint32)
+
+    octets = parts.iloc[:, :4].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    valid = np.isfinite(octets).all(axis=1) & (octets <= 255).all(axis=1) & (octets >= 0).all(axis=1)
+    octets = np.where(valid[:, None], octets, 0).astype(np.uint32)
+
+    return (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+
+
+def unpack_ip(value):
+    value = int(value)
+    return f"{value >> 24 & 255}.{value >> 16 & 255}.{value >> 8 & 255}.{value & 255}"
+
+
+class IPRateTracker:
+    """
+    Count-Min sketches in a ring of time buckets.
+
+    Memory is buckets * depth * width counters no matter how many distinct
+    IPs are seen. Counts only ever over-estimate, by at most about
+    e / width of the traffic in the window per row. Old buckets are zeroed
+    as time advances, so estimates cover the last `window` seconds.
+    """
+
+    def __init__(self, window=WINDOW, buckets=BUCKETS, width=WIDTH, depth=DEPTH, seed=7):
+        if width & (width - 1):
+            raise ValueError("width must be a power of two")
+
+        self.span = window / buckets
+        self.buckets = buckets
+        self.shift = np.uint64(64 - (width.bit_length() - 1))
+        self.table = np.zeros((buckets, depth, width), dtype=np.uint32)
+        # Running sum of all live buckets, so queries never re-add the ring
+        self.live = np.zeros((depth, width), dtype=np.uint32)
+
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: odd 64-bit multipliers, uint64 overflow wraps
+        self.mult = rng.integers(1, 2 ** 63, size=depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.add = rng.integers(0, 2 ** 63, size=depth, dtype=np.uint64)
+
+        self.bucket = None   # absolute index of the newest bucket
+        self.now = None      # newest timestamp seen
+
+    def _hash(self, ips):
+        keys = np.asarray(ips, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            return ((keys[None, :] * self.mult[:, None] + self.add[:, None]) >> self.shift).astype(np.intp)
+
+    def _advance(self, bucket):
+        if self.bucket is None:
+            self.bucket = bucket
+            return
+
+        steps = bucket - self.bucket
+        if steps <= 0:
+            return
+        if steps >= self.buckets:
+            self.table[:] = 0
+            self.live[:] = 0
+        else:
+            for b in range(self.bucket + 1, bucket + 1):
+                expired = self.table[b % self.buckets]
+                self.live -= expired
+                expired[:] = 0
+        self.bucket = bucket
+
+    def _window_counts(self, rows):
+        return np.min(self.live[np.arange(self.live.shape[0])[:, None], rows], axis=0)
+
+    def estimate(self, ips):
+        """
+        Requests per IP in the current window (no update).
+        """
+        return self._window_counts(self._hash(ips))
+
+    def update(self, ips, timestamps=None):
+        """
+        Adds one request per element and returns, for each, the window count
+        just after that request was added.
+
+        timestamps are epoch seconds; NaN or missing values use the newest
+        time seen so far. Requests older than the newest bucket are counted
+        in the newest bucket.
+        """
+        ips = np.asarray(ips, dtype=np.uint32)
+        n = len(ips)
+        if n == 0:
+            return np.zeros(0, dtype=np.uint64)
+
+        if timestamps is None:
+            ts = np.full(n, np.nan)
+        else:
+            ts = np.asarray(timestamps, dtype=np.float64).copy()
+
+        # Fill gaps forward from the last known time
+        known = np.isfinite(ts)
+        if not known.any():
+            ts[:] = self.now if self.now is not None else 0.0
+        else:
+            first = ts[np.argmax(known)] if self.now is None else self.now
+            filled = pd.Series(ts).ffill().fillna(first).to_numpy()
+            ts = filled
+
+        buckets = np.floor(ts / self.span).astype(np.int64)
+        if self.bucket is not None:
+            buckets = np.maximum(buckets, self.bucket)
+        # Buckets never move backwards within a batch either
+        buckets = np.maximum.accumulate(buckets)
+
+        rows = self._hash(ips)
+        counts = np.empty(n, dtype=np.uint64)
+
+        # Requests arrive in order, so each bucket is a contiguous run
+        edges = np.flatnonzero(np.diff(buckets)) + 1
+        for start, stop in zip(np.r_[0, edges], np.r_[edges, n]):
+            self._advance(int(buckets[start]))
+
+            group = ips[start:stop]
+            before = self._window_counts(rows[:, start:stop])
+            # 1-based position of each request among same-IP requests in the run
+            rank = pd.Series(group).groupby(group).cumcount().to_numpy() + 1
+            counts[start:stop] = before.astype(np.uint64) + rank.astype(np.uint64)
+
+            slot = self.table[self.bucket % self.buckets]
+            for d in range(slot.shape[0]):
+                added = np.bincount(rows[d, start:stop], minlength=slot.shape[1])
+                slot[d] += added.astype(np.uint32)
+                self.live[d] += added.astype(np.uint32)
+
+        self.now = float(ts[-1]) if self.now is None else max(self.now, float(ts.max()))
+        return counts
@@ -0,0 +1,30 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Returns module `name` without running it; the module body executes on
+    first attribute access. Entry points use this so pandas, pyarrow and
+    scikit-learn only load once a phase actually needs them.
+
+    The first access should happen on one thread (Python 3.11's LazyLoader
+    is not thread-safe); the pipeline and the scoring service do so.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
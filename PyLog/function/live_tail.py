@@ -0,0 +1,244 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from PyLog.function import behavior
+from PyLog.function import distill_semisup
+from PyLog.function import evaluate_model
+from PyLog.function import features_3
+from PyLog.function import ip_rate
+from PyLog.function import model_registry
+from PyLog.function import parse_log_1
+from PyLog.function import prepare_labels_2
+from PyLog.function import records
+from PyLog.function import train_iforest_6
+from PyLog.function import train_semisup_4
+from PyLog.function.feature_registry import BEHAVIOR_FEATURES, FEATURES, load_method_vocab
+
+# ------------------------------------------------
+# Follow mode: tail a growing log and score it in micro-batches
+# ------------------------------------------------
+
+# Upper bound from a line being written to its alert being emitted
+LATENCY_BUDGET = 0.5      # seconds
+POLL_INTERVAL = 0.05      # seconds between checks when the log is idle
+MAX_BATCH = 20000         # lines scored together at most
+READ_CHUNK = 1024 * 1024  # bytes read per system call
+
+# Minimum risk_score that produces an alert (5 = medium, 7 = high)
+ALERT_MIN_RISK = 5
+
+# Predict with the distilled tree model (see distill_semisup) when it exists
+SERVE_DISTILLED = True
+
+# Fields emitted for each alert (record columns in text form, see records.readable)
+ALERT_COLUMNS = [
+    "date", "time", "source_ip", "http_method", "path", "attack_type",
+    "predicted_label", "anomaly_score", "risk_score", "raw_log"
+]
+
+
+def follow(log_file, from_start=False, poll_interval=POLL_INTERVAL, stop=None):
+    """
+    Yields lists of complete new lines, following rotation and truncation.
+
+    stop is an optional threading.Event that ends the generator. An empty
+    list is yielded whenever the file is idle so callers can flush.
+    """
+    f = None
+    buffer = b""
+
+    while stop is None or not stop.is_set():
+        if f is None:
+            try:
+                f = open(log_file, "rb")
+            except FileNotFoundError:
+                time.sleep(poll_interval)
+                continue
+            if not from_start:
+                f.seek(0, os.SEEK_END)
+            # Any file opened after the first one is read from its start
+            from_start = True
+            buffer = b""
+
+        chunk = f.read(READ_CHUNK)
+        if chunk:
+            buffer += chunk
+            cut = buffer.rfind(b"\n") + 1
+            if cut:
+                lines = buffer[:cut].decode("utf-8", errors="ignore").splitlines()
+                buffer = buffer[cut:]
+                yield lines
+            continue
+
+        # At EOF: check whether the path now points at a new (rotated) file
+        try:
+            current = os.stat(log_file)
+        except FileNotFoundError:
+            current = None
+
+        opened = os.fstat(f.fileno())
+        if current is None or current.st_ino != opened.st_ino:
+            f.close()
+            f = None
+            if buffer:
+                yield [buffer.decode("utf-8", errors="ignore")]
+            continue
+
+        if current.st_size < f.tell():
+            # Truncated in place (copytruncate rotation)
+            f.seek(0)
+            buffer = b""
+            continue
+
+        yield []
+        time.sleep(poll_interval)
+
+    if f is not None:
+        f.close()
+
+
+def micro_batches(line_chunks, latency_budget=LATENCY_BUDGET, max_batch=MAX_BATCH):
+    """
+    Groups line chunks into batches that are flushed when full, when the
+    oldest buffered line reaches half the latency budget, or when idle.
+    """
+    pending = []
+    first_seen = None
+
+    for lines in line_chunks:
+        if lines:
+            if not pending:
+                first_seen = time.perf_counter()
+            pending.extend(lines)
+
+        age = time.perf_counter() - first_seen if pending else 0.0
+        if pending and (not lines or len(pending) >= max_batch or age >= latency_budget / 2):
+            while pending:
+                yield pending[:max_batch]
+                pending = pending[max_batch:]
+
+    if pending:
+        yield pending
+
+
+def load_models():
+    """
+    Loads the registered semi-supervised model, scaler and forest once.
+    With SERVE_DISTILLED, the model distilled from the semi-supervised one
+    is used instead when there is one for the current version.
+    """
+    train_semisup_4.import_legacy()
+
+    # The distilled model takes raw features, so it comes without a scaler
+    distilled = distill_semisup.load() if SERVE_DISTILLED else None
+    if distilled is not None:
+        model, semisup_meta = distilled
+        scaler = None
+    else:
+        semisup, semisup_meta = model_registry.load(train_semisup_4.MODEL_NAME)
+        model, scaler = semisup["model"], semisup["scaler"]
+
+    forest, forest_meta = model_registry.load(train_iforest_6.MODEL_NAME)
+
+    return {
+        "model": model,
+        "scaler": scaler,
+        "semisup_features": semisup_meta["features"],
+        "distilled": semisup_meta["version"] if distilled is not None else None,
+        "forest": forest,
+        "forest_features": forest_meta["features"],
+        "vocab": load_method_vocab(),
+    }
+
+
+class Scorer:
+    """
+    Labels, featurizes and scores batches of raw lines with warm models.
+
+    Per-IP rates live in a fixed-memory sliding-window sketch that is
+    updated with every batch, the same way prepare_labels_2 computes them;
+    the behaviour windows are carried over batches the same way.
+    """
+
+    def __init__(self, models=None):
+        self.models = models or load_models()
+        self.rates = ip_rate.IPRateTracker(window=prepare_labels_2.FREQ_WINDOW or ip_rate.WINDOW)
+        self.behavior = behavior.BehaviorWindow()
+
+    def score_lines(self, lines):
+        rows = [row for row in map(parse_log_1.parse_line, lines) if row is not None]
+        if not rows:
+            return pd.DataFrame(columns=parse_log_1.COLUMNS)
+        return self.score_frame(records.compact_frame(pd.DataFrame(rows, columns=parse_log_1.COLUMNS)))
+
+    def score_frame(self, df):
+        models = self.models
+
+        # Phase two: labels and sliding-window per-IP frequency
+        df["label"] = prepare_labels_2.label_frame(df)
+        df["freq_label"] = prepare_labels_2.windowed_freq_labels(df, self.rates)
+        df[BEHAVIOR_FEATURES] = self.behavior.update(df).set_axis(df.index)
+
+        # Phase three: features
+        df[FEATURES] = features_3.extract(df, models["vocab"])
+
+        # Phase five: semi-supervised prediction
+        X = df[models["semisup_features"]].fillna(0).values
+        if models["scaler"] is not None:
+            X = models["scaler"].transform(X)
+        df["predicted_label"] = models["model"].predict(X)
+
+        # Final phase: behavioural anomaly
+        decision = train_iforest_6.score(models["forest"], df[models["forest_features"]], n_jobs=1)
+        df["anomaly_score"] = -decision
+        df["behavior_anomaly"] = np.where(decision < 0, -1, 1)
+
+        evaluate_model.score_frame(df)
+        return df
+
+
+def print_alert(row):
+    print(json.dumps(row, default=str), flush=True)
+
+
+def run(log_file, from_start=False, on_alert=print_alert, latency_budget=LATENCY_BUDGET,
+        max_batch=MAX_BATCH, stop=None, models=None):
+    """
+    Tails log_file and calls on_alert(dict) for every event at or above
+    ALERT_MIN_RISK. Returns the number of lines processed.
+    """
+    scorer = Scorer(models)
+    processed = 0
+
+    chunks = follow(log_file, from_start=from_start, stop=stop)
+    for batch in micro_batches(chunks, latency_budget, max_batch):
+        scored = scorer.score_lines(batch)
+        processed += len(batch)
+
+        if scored.empty:
+            continue
+
+        alerts = records.readable(scored[scored["risk_score"] >= ALERT_MIN_RISK])
+        for row in alerts[ALERT_COLUMNS].to_dict("records"):
+            on_alert(row)
+
+    return processed
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Follow an access log and print alerts as JSON lines")
+    cli.add_argument("log_file")
+    cli.add_argument("--from-start", action="store_true", help="score existing content first")
+    cli.add_argument("--latency", type=float, default=LATENCY_BUDGET, help="latency budget in seconds")
+    args = cli.parse_args()
+
+    try:
+        run(args.log_file, from_start=args.from_start, latency_budget=args.latency)
+    except KeyboardInterrupt:
+        sys.exit(0)
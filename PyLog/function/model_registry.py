@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# ------------------------------------------------
+# Versioned model registry
+# ------------------------------------------------
+# PyLog/Model/registry/<name>/v0001/model.joblib
+#                              /v0001/meta.json
+#                              /v0001/...          (extra files, version_file)
+#                       <name>/pinned.txt      (optional, else latest)
+REGISTRY_DIR = "PyLog/Model/registry"
+
+# Largest standardized shift of any feature mean before a retrain is due
+DRIFT_THRESHOLD = 0.25
+
+
+def _name_dir(name):
+    return os.path.join(REGISTRY_DIR, name)
+
+
+def _version_dir(name, version):
+    return os.path.join(_name_dir(name), f"v{version:04d}")
+
+
+def versions(name):
+    if not os.path.isdir(_name_dir(name)):
+        return []
+    return sorted(
+        int(entry[1:])
+        for entry in os.listdir(_name_dir(name))
+        if entry.startswith("v") and entry[1:].isdigit()
+    )
+
+
+def pin(name, version):
+    """
+    Makes load() return this version until unpinned.
+    """
+    if version not in versions(name):
+        raise LookupError(f"{name} has no version {version}")
+    with open(os.path.join(_name_dir(name), "pinned.txt"), "w") as f:
+        f.write(str(version))
+
+
+def unpin(name):
+    path = os.path.join(_name_dir(name), "pinned.txt")
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def current_version(name):
+    """
+    The pinned version, or the latest one, or None if nothing is registered.
+    """
+    path = os.path.join(_name_dir(name), "pinned.txt")
+    if os.path.exists(path):
+        with open(path) as f:
+            return int(f.read().strip())
+
+    available = versions(name)
+    return available[-1] if available else None
+
+
+def version_file(name, version, filename):
+    """
+    Path of an extra file kept next to a version's model.joblib.
+    """
+    return os.path.join(_version_dir(name, version), filename)
+
+
+def metadata(name, version=None):
+    if version is None:
+        version = current_version(name)
+    if version is None:
+        return None
+
+    with open(os.path.join(_version_dir(name, version), "meta.json")) as f:
+        return json.load(f)
+
+
+def current_id(name):
+    """
+    Short identity of the model load() would return, for cache keys.
+    """
+    meta = metadata(name)
+    if meta is None:
+        return f"{name}:none"
+    return f"{name}:v{meta['version']}:{meta['fingerprint']}"
+
+
+def fingerprint(frame):
+    """
+    Content hash of a training frame, independent of its index.
+    """
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    h = hashlib.blake2b(digest_size=16)
+    h.update(",".join(frame.columns).encode())
+    h.update(hashes.tobytes())
+    return h.hexdigest()
+
+
+def feature_stats(X):
+    X = np.asarray(X, dtype=np.float64)
+    return {"mean": X.mean(axis=0).tolist(), "std": X.std(axis=0).tolist()}
+
+
+def drift(meta, X):
+    """
+    Largest shift of a feature mean, in training standard deviations.
+    """
+    stats = meta.get("stats")
+    if not stats:
+        return float("inf")
+
+    X = np.asarray(X, dtype=np.float64)
+    if len(X) == 0:
+        return 0.0
+
+    mean = np.asarray(stats["mean"])
+    std = np.asarray(stats["std"])
+    std = np.where(std > 0, std, 1.0)
+    return float(np.max(np.abs(X.mean(axis=0) - mean) / std))
+
+
+def register(name, model, features, data_fingerprint, stats=None, params=None):
+    """
+    Stores a new version and returns its number.
+    """
+    available = versions(name)
+    version = available[-1] + 1 if available else 1
+
+    path = _version_dir(name, version)
+    os.makedirs(path)
+
+    # Uncompressed so load() can memory-map the numpy arrays inside
+    joblib.dump(model, os.path.join(path, "model.joblib"))
+
+    meta = {
+        "name": name,
+        "version": version,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "features": list(features),
+        "fingerprint": data_fingerprint,
+        "stats": stats,
+        "params": params or {},
+    }
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2, default=str)
+
+    return version
+
+
+def load(name, version=None, mmap_mode="r"):
+    """
+    Returns (model, meta) for the pinned/latest or the given version.
+    """
+    if version is None:
+        version = current_version(name)
+    if version is None:
+        raise LookupError(f"No registered model named {name!r}")
+
+    model = joblib.load(os.path.join(_version_dir(name, version), "model.joblib"), mmap_mode=mmap_mode)
+    return model, metadata(name, version)
+
+
+def needs_training(name, features, X, threshold=None):
+    """
+    True when nothing usable is registered or the data has drifted.
+    """
+    if threshold is None:
+        threshold = DRIFT_THRESHOLD
+
+    meta = metadata(name)
+    if meta is None or meta["features"] != list(features):
+        return True
+
+    shift = drift(meta, X)
+    print(f"[+] {name} v{meta['version']} drift: {shift:.3f} (threshold {threshold})")
+    return shift > threshold
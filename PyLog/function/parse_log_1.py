@@ -1,7 +1,55 @@
+import bz2
+import glob
+import gzip
+import mmap
+import os
 import re
-import pandas as pd
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from PyLog.function import frame_store
+from PyLog.function import progress
+from PyLog.function import records
+
+log_files = "data/input/input.log*"
+OUTPUT_FILE = frame_store.path_of("parsed")
+
+# Rows held in memory at once; peak memory scales with this, not the log size
+BATCH_SIZE = 50000
+
+# Bytes scanned per regex pass; plain files are memory-mapped, compressed
+# ones are read in pieces of this size
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# Plain-text logs are split into line-aligned byte ranges of about this size.
+# Compressed rotations cannot be seeked cheaply, so each one is a single shard.
+SHARD_SIZE = 64 * 1024 * 1024
+
+ROTATION_SUFFIX = re.compile(r"\.(\d+)$")
+
+COLUMNS = [
+    "date",
+    "time",
+    "source_ip",
+    "http_method",
+    "path",
+    "attack_type",
+    "status_code",
+    "raw_log"
+]
+
+# Text fields read from a line; parsed.arrow stores them as compact records
+# (records.SCHEMA) with raw_log kept as a reference into the source log
+FIELDS = [column for column in COLUMNS if column != "raw_log"]
+FIELD_SCHEMA = pa.schema([(column, pa.string()) for column in FIELDS])
+
+SCHEMA = records.SCHEMA
 
-log_files = "data/input/input.log"
 # Regex patterns
 request_pattern = re.compile(
     r'(?P<ip>\d+\.\d+\.\d+\.\d+)\s+-\s+-\s+'
@@ -20,39 +68,385 @@ attack_pattern = re.compile(
     re.IGNORECASE
 )
 
-rows = []
-
-def parser(log_file=log_files):
-
-    with open(log_file, "r", errors="ignore") as f:
-        for line in f:
-            req = request_pattern.search(line)
-            atk = attack_pattern.search(line)
-
-            if req:
-                rows.append({
-                    "date": req.group("date"),
-                    "time": req.group("time"),
-                    "source_ip": req.group("ip"),
-                    "http_method": req.group("method"),
-                    "path": req.group("path"),
-                    "attack_type": "unknown",
-                    "status_code":req.group("status"),
-                    "raw_log": line.strip()
-                })
-
-            elif atk:
-                rows.append({
-                    "date": "",
-                    "time": "",
-                    "source_ip": atk.group("ip"),
-                    "http_method": "",
-                    "path": "",
-                    "attack_type": atk.group("attack"),
-                    "raw_log": line.strip()
-                })
-
-    df = pd.DataFrame(rows)
-    df.to_csv("PyLog/Csv/parsed/parsed.csv", index=False)
-    print("[+] parsed.csv created")
+# Block scanner patterns (RE2 syntax, run by pyarrow.compute over every
+# line of a block at once). They spell out Python's ASCII \s and \S, so on
+# ASCII lines they accept exactly what request_pattern / attack_pattern do.
+# \x1c-\x1f (also whitespace to Python) are left out: blocks containing
+# them go through parse_line instead.
+_SPACE = r"[\t\x0b\x0c\r ]+"
+_TOKEN = r"[^\t\x0b\x0c\r ]+"
+_REQUEST = (
+    r"\d+\.\d+\.\d+\.\d+" + _SPACE + "-" + _SPACE + "-" + _SPACE +
+    r"\[\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2}" + _SPACE + r"[+\-]\d{4}\]" + _SPACE +
+    r'"(?i:GET|POST|PUT|HEAD|DELETE)' + _SPACE +
+    _TOKEN + _SPACE + r'(?i:HTTP)/\d\.\d"' + _SPACE +
+    r"\d{3}" + _SPACE + r"(?:\d+|-)"
+)
+_ATTACK = (
+    r"(?i:Glaspot:)" + _SPACE + r"(?P<attack_type>\w+)" + _SPACE + r"(?i:attack)" + _SPACE +
+    r"(?i:method)" + _SPACE + r"(?i:from)" + _SPACE + r"(?P<source_ip>\d+\.\d+\.\d+\.\d+)"
+)
+
+# Fast path: a request starting the line. Its fields are then simply the
+# line's whitespace-separated tokens, so no capture groups are needed.
+# Remaining lines are checked for a request further in (rare; these go
+# through parse_line) and then for a Glaspot attack.
+REQUEST_AT_START = "^" + _REQUEST
+
+# Tokens of a line-leading request: ip - - [date:time zone] "method path version" status size
+_IP, _STAMP, _METHOD, _PATH, _STATUS = 0, 3, 5, 6, 8
+
+# Python whitespace the patterns above leave out
+_SEPARATORS = [b"\x1c", b"\x1d", b"\x1e", b"\x1f"]
+
+
+def parse_line(line):
+    """
+    Returns one parsed record for a log line, or None if it matches neither pattern.
+    """
+    req = request_pattern.search(line)
+    if req:
+        return {
+            "date": req.group("date"),
+            "time": req.group("time"),
+            "source_ip": req.group("ip"),
+            "http_method": req.group("method"),
+            "path": req.group("path"),
+            "attack_type": "unknown",
+            "status_code": req.group("status"),
+            "raw_log": line.strip()
+        }
+
+    atk = attack_pattern.search(line)
+    if atk:
+        return {
+            "date": "",
+            "time": "",
+            "source_ip": atk.group("ip"),
+            "http_method": "",
+            "path": "",
+            "attack_type": atk.group("attack"),
+            "status_code": "",
+            "raw_log": line.strip()
+        }
+
+    return None
+
+
+def open_log(log_file):
+    """
+    Opens a plain, .gz or .bz2 log in binary mode.
+    """
+    if log_file.endswith(".gz"):
+        return gzip.open(log_file, "rb")
+    if log_file.endswith(".bz2"):
+        return bz2.open(log_file, "rb")
+    return open(log_file, "rb")
+
+
+def iter_blocks(log_file, start=0, end=None, block_size=BLOCK_SIZE):
+    """
+    Yields (offset, bytes) for the lines that begin inside [start, end), in
+    blocks of about block_size that always end on a line break. offset is
+    where the block starts in the (decompressed) log.
+    """
+    if not log_file.endswith((".gz", ".bz2")):
+        with open(log_file, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            end = size if end is None else min(end, size)
+            if start >= end:
+                return
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos = start
+                while pos < end:
+                    # Extend to the break ending the line that holds the last byte wanted
+                    cut = mm.find(b"\n", min(pos + block_size, end) - 1) + 1
+                    cut = cut or size
+                    yield pos, mm[pos:cut]
+                    pos = cut
+        return
+
+    with open_log(log_file) as f:
+        if start:
+            f.seek(start)
+        pos = start
+        rest = b""
+
+        while end is None or pos < end:
+            data = f.read(block_size)
+            if not data:
+                break
+            data = rest + data
+            cut = data.rfind(b"\n") + 1
+            block, rest = data[:cut], data[cut:]
+
+            if end is not None and pos + len(block) > end:
+                block = block[:block.find(b"\n", end - pos - 1) + 1]
+            if block:
+                yield pos, block
+            pos += len(block)
+
+        if rest and (end is None or pos < end):
+            yield pos, rest
+
+
+def line_spans(block):
+    """
+    Start offset and length (without the line break) of every line in a
+    block, in the order block.split(b"\\n") returns them.
+    """
+    breaks = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord("\n"))
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.concatenate((breaks, [len(block)]))
+    return starts, ends - starts
+
+
+def _parse_lines(lines):
+    rows, index = [], []
+    for i, raw in enumerate(lines):
+        row = parse_line(raw.decode("utf-8", errors="ignore"))
+        if row is not None:
+            rows.append(row)
+            index.append(i)
+    return pa.Table.from_pylist(rows, schema=FIELD_SCHEMA), np.array(index, dtype=np.int64)
+
+
+def _request_table(lines):
+    tokens = pc.ascii_split_whitespace(lines, max_splits=_STATUS + 1)
+    stamp = pc.list_element(tokens, _STAMP)
+    columns = {
+        "date": pc.utf8_slice_codeunits(stamp, 1, 12),
+        "time": pc.utf8_slice_codeunits(stamp, 13, 21),
+        "source_ip": pc.list_element(tokens, _IP),
+        "http_method": pc.utf8_slice_codeunits(pc.list_element(tokens, _METHOD), 1),
+        "path": pc.list_element(tokens, _PATH),
+        "attack_type": pa.repeat("unknown", len(lines)),
+        "status_code": pc.list_element(tokens, _STATUS),
+    }
+    return pa.Table.from_arrays([columns[c] for c in FIELDS], schema=FIELD_SCHEMA)
+
+
+def _attack_table(lines):
+    fields = pc.extract_regex(lines, _ATTACK)
+    empty = pa.repeat("", len(lines))
+    columns = {
+        "date": empty,
+        "time": empty,
+        "source_ip": fields.field("source_ip"),
+        "http_method": empty,
+        "path": empty,
+        "attack_type": fields.field("attack_type"),
+        "status_code": empty,
+    }
+    return pa.Table.from_arrays([columns[c] for c in FIELDS], schema=FIELD_SCHEMA)
+
+
+def parse_block(block):
+    """
+    Parses a block of raw lines into an Arrow table of text FIELDS, in line
+    order, plus the index of the line each row came from.
+
+    ASCII blocks are matched column-wise by pyarrow.compute (RE2), which
+    only ever decodes the block once and slices the fields out of it.
+    Blocks with other bytes are decoded and parsed line by line.
+    """
+    if not block.isascii() or any(sep in block for sep in _SEPARATORS):
+        return _parse_lines(block.split(b"\n"))
+
+    lines = pc.split_pattern(pa.array([block.decode("ascii")], pa.string()), "\n").flatten()
+    fast = pc.match_substring_regex(lines, REQUEST_AT_START).to_numpy(zero_copy_only=False)
+
+    tables = [_request_table(lines.filter(fast))]
+    positions = [np.flatnonzero(fast)]
+
+    # A request further into a line takes priority over a Glaspot match
+    others = np.flatnonzero(~fast)
+    rest = lines.take(others)
+    later = pc.match_substring_regex(rest, _REQUEST)
+    attack = pc.and_not(pc.match_substring_regex(rest, _ATTACK), later)
+
+    if pc.any(later).as_py():
+        table, _ = _parse_lines(raw.encode("ascii") for raw in rest.filter(later).to_pylist())
+        tables.append(table)
+        positions.append(others[later.to_numpy(zero_copy_only=False)])
+    if pc.any(attack).as_py():
+        tables.append(_attack_table(rest.filter(attack)))
+        positions.append(others[attack.to_numpy(zero_copy_only=False)])
+
+    if len(tables) == 1:
+        return tables[0], positions[0]
+    # Back into line order
+    positions = np.concatenate(positions)
+    order = np.argsort(positions, kind="stable")
+    return pa.concat_tables(tables).take(order), positions[order]
+
+
+def iter_batches(log_file, batch_size=BATCH_SIZE, start=0, end=None, file_id=0):
+    """
+    Yields parsed records (records.SCHEMA) as Arrow record batches of at
+    most batch_size rows; raw_file is file_id.
+
+    start/end restrict parsing to the lines that begin inside that byte range.
+    """
+    for offset, block in iter_blocks(log_file, start, end):
+        fields, line = parse_block(block)
+        starts, lengths = line_spans(block)
+        refs = [
+            pa.repeat(pa.scalar(file_id, pa.uint16()), len(line)),
+            pa.array(offset + starts[line], pa.int64()),
+            pa.array(lengths[line], pa.uint32()),
+        ]
+        table = pa.Table.from_arrays(records.from_text(fields).columns + refs, schema=SCHEMA)
+        for batch in table.to_batches(max_chunksize=batch_size):
+            if batch.num_rows:
+                yield batch
+
+
+def write_batches(batches, out_file=OUTPUT_FILE):
+    """
+    Appends each batch to an Arrow file as it arrives and returns the row count.
+    """
+    total = 0
+    with frame_store.open_writer(out_file, SCHEMA) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            total += len(batch)
+            progress.report(total)
+            progress.check()
+
+    return total
+
+
+def _rotation_key(log_file):
+    """
+    Orders rotations oldest first: access.log.2.gz, access.log.1, access.log
+    """
+    name = log_file
+    for ext in (".gz", ".bz2"):
+        if name.endswith(ext):
+            name = name[:-len(ext)]
+
+    match = ROTATION_SUFFIX.search(name)
+    if match:
+        return (name[:match.start()], -int(match.group(1)))
+    return (name, 0)
+
+
+def expand_inputs(log_file):
+    """
+    Turns a path, glob or list of them into a de-duplicated, ordered file list.
+    """
+    if isinstance(log_file, str):
+        log_file = [log_file]
+
+    files = []
+    for item in log_file:
+        matches = glob.glob(item) if glob.has_magic(item) else [item]
+        for path in matches:
+            if path not in files:
+                files.append(path)
+
+    return sorted(files, key=_rotation_key)
+
+
+def shard_ranges(log_file, shard_size=SHARD_SIZE):
+    """
+    Splits a plain log into (start, end) byte ranges that begin on a line start.
+    """
+    if log_file.endswith((".gz", ".bz2")):
+        return [(0, None)]
+
+    size = os.path.getsize(log_file)
+    bounds = [0]
+
+    with open(log_file, "rb") as f:
+        for offset in range(shard_size, size, shard_size):
+            if offset <= bounds[-1]:
+                continue
+            f.seek(offset)
+            f.readline()
+            if f.tell() < size:
+                bounds.append(f.tell())
+
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _parse_shard(task):
+    log_file, file_id, start, end, part_file, batch_size = task
+    return write_batches(iter_batches(log_file, batch_size, start, end, file_id), part_file)
+
+
+def parse_files(log_file=log_files, out_file=OUTPUT_FILE, workers=None,
+                shard_size=SHARD_SIZE, batch_size=BATCH_SIZE, sources_file=records.SOURCES_FILE):
+    """
+    Parses every input shard on a process pool and merges the parts in order.
+
+    Output order is input order (rotations oldest first), then byte offset,
+    so it does not depend on which worker finishes first. The input list is
+    saved to sources_file; raw_file indexes into it.
+    """
+    files = expand_inputs(log_file)
+    if not files:
+        raise FileNotFoundError(f"No log files match {log_file!r}")
+    records.save_sources(files, sources_file)
+
+    ranges = [
+        (path, file_id, start, end)
+        for file_id, path in enumerate(files)
+        for start, end in shard_ranges(path, shard_size)
+    ]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(ranges)))
+
+    # A single shard needs no pool and no merge step
+    if workers == 1 and len(ranges) == 1:
+        path, file_id, start, end = ranges[0]
+        return write_batches(iter_batches(path, batch_size, start, end, file_id), out_file)
+
+    os.makedirs(os.path.dirname(out_file) or ".", exist_ok=True)
+    part_dir = tempfile.mkdtemp(prefix="parse_", dir=os.path.dirname(out_file) or ".")
+
+    try:
+        tasks = [
+            (path, file_id, start, end, os.path.join(part_dir, f"part-{i:05d}.arrow"), batch_size)
+            for i, (path, file_id, start, end) in enumerate(ranges)
+        ]
+
+        counts = []
+        if workers == 1:
+            for task in tasks:
+                counts.append(_parse_shard(task))
+                progress.report(len(counts), len(tasks), "shards")
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_parse_shard, task) for task in tasks]
+                try:
+                    for future in futures:
+                        counts.append(future.result())
+                        progress.report(len(counts), len(tasks), "shards")
+                        progress.check()
+                except progress.Cancelled:
+                    pool.shutdown(cancel_futures=True)
+                    raise
+
+        with frame_store.open_writer(out_file, SCHEMA) as writer:
+            for task in tasks:
+                with pa.memory_map(task[4]) as source:
+                    reader = pa.ipc.open_file(source)
+                    for i in range(reader.num_record_batches):
+                        writer.write_batch(reader.get_batch(i))
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+
+    return sum(counts)
+
+
+def parser(log_file=log_files, batch_size=BATCH_SIZE, workers=None):
+    frame_store.discard("parsed")
+    total = parse_files(log_file, workers=workers, batch_size=batch_size)
+    print(f"[+] parsed.arrow created ({total} rows)")
     return True
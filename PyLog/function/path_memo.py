@@ -0,0 +1,161 @@
+import hashlib
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from PyLog.function.feature_registry import PATH_FEATURES
+
+# ------------------------------------------------
+# Path label and path features, once per distinct path
+# ------------------------------------------------
+# Logs repeat a few thousand paths millions of times. The labeler and the
+# feature kernel look each distinct path up here; only paths never seen
+# before are computed, and the table is kept across runs and log files.
+MEMO_FILE = "PyLog/Cache/path_memo.arrow"
+
+# Paths kept on disk; the least recently used go first
+MAX_PATHS = 200_000
+
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules whose code decides a path's label or features; editing one of
+# them (or using other rules) starts an empty memo
+CODE = ["prepare_labels_2", "features_3", "feature_registry"]
+
+_shared = {}
+
+
+def fingerprint(labeler):
+    digest = hashlib.sha256(labeler.key.encode())
+    for module in CODE:
+        with open(os.path.join(FUNCTION_DIR, module + ".py"), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class PathMemo:
+    """
+    path -> (label from labeler's path rules, PATH_FEATURES row).
+
+    labeler is a make_labeler() labeler; its attack_type rule is applied
+    by the labeler itself on top of the path label. Entries are ranked by
+    the last run that used them and cut to max_paths on save(), which also
+    starts the next run (a process reusing the memo through shared() runs
+    the pipeline many times).
+    """
+
+    def __init__(self, labeler, memo_file=MEMO_FILE, max_paths=MAX_PATHS):
+        self.labeler = labeler
+        self.memo_file = memo_file
+        self.max_paths = max_paths
+        self.fingerprint = fingerprint(labeler)
+
+        self.paths = []
+        self.index = {}
+        self.labels = np.empty(0, dtype=np.int64)
+        self.features = np.empty((0, len(PATH_FEATURES)), dtype=np.int64)
+        self.used = np.empty(0, dtype=np.int64)
+        self.run = 0
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.memo_file):
+            return
+
+        table = feather.read_table(self.memo_file)
+        meta = table.schema.metadata or {}
+        if meta.get(b"fingerprint", b"").decode() != self.fingerprint:
+            return
+
+        self.run = int(meta[b"run"]) + 1
+        self.paths = table["path"].to_pylist()
+        self.index = {path: i for i, path in enumerate(self.paths)}
+        self.labels = table["label"].to_numpy().astype(np.int64)
+        self.features = np.column_stack(
+            [table[name].to_numpy() for name in PATH_FEATURES]
+        ).astype(np.int64).reshape(len(self.paths), len(PATH_FEATURES))
+        self.used = table["used"].to_numpy().astype(np.int64)
+
+    def lookup(self, paths):
+        """
+        Labels and path-feature rows for a list of distinct path strings.
+        """
+        from PyLog.function import features_3
+
+        rows = np.fromiter((self.index.get(path, -1) for path in paths), dtype=np.int64, count=len(paths))
+        missing = np.flatnonzero(rows < 0)
+        self.misses += len(missing)
+        self.hits += len(paths) - len(missing)
+
+        if len(missing):
+            new = [paths[i] for i in missing]
+            start = len(self.paths)
+            self.paths.extend(new)
+            self.index.update((path, start + i) for i, path in enumerate(new))
+            self.labels = np.concatenate([self.labels, self.labeler.label_paths(new)])
+            self.features = np.vstack([self.features, features_3.path_matrix(new)])
+            self.used = np.concatenate([self.used, np.zeros(len(new), dtype=np.int64)])
+            rows[missing] = np.arange(start, start + len(new))
+
+        self.used[rows] = self.run
+        self.dirty = True
+        return self.labels[rows], self.features[rows]
+
+    def _trim(self):
+        """
+        Drops all but the most recently used max_paths entries.
+        """
+        if len(self.paths) <= self.max_paths:
+            return
+
+        keep = np.sort(np.argsort(-self.used, kind="stable")[:self.max_paths])
+        self.paths = [self.paths[i] for i in keep]
+        self.index = {path: i for i, path in enumerate(self.paths)}
+        self.labels = self.labels[keep]
+        self.features = self.features[keep]
+        self.used = self.used[keep]
+
+    def save(self):
+        """
+        Writes the most recently used max_paths entries and moves on to the
+        next run.
+        """
+        if not self.dirty:
+            return
+
+        self._trim()
+        columns = {
+            "path": pa.array(self.paths, pa.string()),
+            "label": pa.array(self.labels, pa.int8()),
+            "used": pa.array(self.used, pa.int64()),
+        }
+        for j, name in enumerate(PATH_FEATURES):
+            columns[name] = pa.array(self.features[:, j], pa.int32())
+
+        table = pa.table(columns).replace_schema_metadata({
+            "fingerprint": self.fingerprint,
+            "run": str(self.run),
+        })
+
+        os.makedirs(os.path.dirname(self.memo_file) or ".", exist_ok=True)
+        tmp = self.memo_file + ".tmp"
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, self.memo_file)
+        self.dirty = False
+        self.run += 1
+
+
+def shared(labeler, memo_file=MEMO_FILE):
+    """
+    One memo per labeler and file for the whole process, so the labeling
+    and feature phases of a pipeline run load it once.
+    """
+    key = (memo_file, fingerprint(labeler))
+    if key not in _shared:
+        _shared[key] = PathMemo(labeler, memo_file)
+    return _shared[key]
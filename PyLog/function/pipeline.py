@@ -0,0 +1,421 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+from PyLog.function import frame_store
+from PyLog.function import feature_registry
+from PyLog.function import instrument
+from PyLog.function import progress
+from PyLog.function.lazy import lazy_import
+
+# Phase modules (and pandas / scikit-learn behind them) load when a stage
+# first touches them, so importing the pipeline costs almost nothing and a
+# fully cached run never loads scikit-learn
+model_registry = lazy_import("PyLog.function.model_registry")
+parse_log_1 = lazy_import("PyLog.function.parse_log_1")
+records = lazy_import("PyLog.function.records")
+prepare_labels_2 = lazy_import("PyLog.function.prepare_labels_2")
+behavior = lazy_import("PyLog.function.behavior")
+features_3 = lazy_import("PyLog.function.features_3")
+train_semisup_4 = lazy_import("PyLog.function.train_semisup_4")
+distill_semisup = lazy_import("PyLog.function.distill_semisup")
+predict_semisup_5 = lazy_import("PyLog.function.predict_semisup_5")
+train_iforest_6 = lazy_import("PyLog.function.train_iforest_6")
+aggregate_7 = lazy_import("PyLog.function.aggregate_7")
+evaluate_model = lazy_import("PyLog.function.evaluate_model")
+results_store = lazy_import("PyLog.function.results_store")
+
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ------------------------------------------------
+# Content-addressed stage cache
+# ------------------------------------------------
+CACHE_DIR = "PyLog/Cache/stages"
+HASH_INDEX = "PyLog/Cache/file_hashes.json"
+
+# Least recently used entries are evicted above this total size
+CACHE_SIZE_CAP = 2 * 1024 ** 3
+
+# Each stage declares what it reads, which knobs affect it and what it writes.
+# inputs/outputs are frame_store artifact names or file paths (globs allowed
+# for inputs); a callable input contributes the string it returns. Either
+# list may itself be a callable returning the list.
+# code names the modules in this directory whose source keys the stage.
+# params is called at run time so overrides are picked up.
+# run(force) gets True when the caller forced that stage.
+# Stages with "cache": False always run (they decide internally what to do).
+STAGES = [
+    {
+        "name": "parse",
+        "label": "Phase One",
+        "run": lambda force: parse_log_1.parser(),
+        "code": ["parse_log_1", "records"],
+        "inputs": lambda: [parse_log_1.log_files],
+        "params": lambda: {"columns": records.COLUMNS},
+        "outputs": lambda: ["parsed", records.SOURCES_FILE],
+    },
+    {
+        "name": "prepare",
+        "label": "Phase Two",
+        "run": lambda force: prepare_labels_2.prepare(),
+        "code": ["prepare_labels_2", "records", "path_memo"],
+        "inputs": ["parsed"],
+        "params": lambda: {
+            "rules": prepare_labels_2.RULES,
+            "attack_types": prepare_labels_2.ATTACK_TYPES,
+            "normal_paths": prepare_labels_2.NORMAL_PATHS,
+            "freq_thresholds": prepare_labels_2.FREQ_THRESHOLDS,
+            "freq_window": prepare_labels_2.FREQ_WINDOW,
+        },
+        "outputs": ["labeled"],
+    },
+    {
+        "name": "behavior",
+        "label": "Behaviour",
+        # Appended log data only computes the new rows unless forced
+        "run": lambda force: behavior.behavior(incremental=not force),
+        "code": ["behavior", "records"],
+        "inputs": ["labeled"],
+        "params": lambda: {"window": behavior.WINDOW, "rate_window": behavior.RATE_WINDOW},
+        "outputs": lambda: ["behavior", behavior.STATE_FILE],
+    },
+    {
+        "name": "features",
+        "label": "Phase Three",
+        "run": lambda force: features_3.features(),
+        "code": ["features_3", "feature_registry", "path_memo"],
+        "inputs": ["labeled", feature_registry.METHOD_VOCAB_FILE],
+        "params": lambda: {"features": feature_registry.FEATURE_TABLE},
+        "outputs": ["features"],
+    },
+    {
+        "name": "train",
+        "label": "Phase Four",
+        "run": lambda force: train_semisup_4.train(force=force),
+        "code": ["train_semisup_4", "feature_registry"],
+        "inputs": ["features"],
+        "params": lambda: {
+            "features": feature_registry.SEMISUP_FEATURES,
+            "train_size": train_semisup_4.TRAIN_SIZE,
+            "n_neighbors": train_semisup_4.N_NEIGHBORS,
+        },
+        # Registers a new model version only when forced or drifted
+        "cache": False,
+        "outputs": [],
+    },
+    {
+        "name": "distill",
+        "label": "Distill",
+        "run": lambda force: distill_semisup.distill(force=force),
+        "code": ["distill_semisup", "tree_ensemble"],
+        "inputs": ["features"],
+        "params": lambda: {
+            "n_trees": distill_semisup.N_TREES,
+            "synthetic_rows": distill_semisup.SYNTHETIC_ROWS,
+            "holdout": distill_semisup.HOLDOUT,
+        },
+        # Distils each semi-supervised model version once, for serving
+        "cache": False,
+        "outputs": [],
+    },
+    {
+        "name": "predict",
+        "label": "Phase five",
+        "run": lambda force: predict_semisup_5.predict(),
+        "code": ["predict_semisup_5", "feature_registry"],
+        "inputs": [
+            "features",
+            lambda: model_registry.current_id(train_semisup_4.MODEL_NAME),
+        ],
+        "params": lambda: {"features": feature_registry.SEMISUP_FEATURES},
+        "outputs": ["semisup_output"],
+    },
+    {
+        "name": "iforest",
+        "label": "Final Phase",
+        "run": lambda force: train_iforest_6.iforest(force=force),
+        "code": ["train_iforest_6", "feature_registry"],
+        "inputs": [
+            "semisup_output",
+            "behavior",
+            lambda: model_registry.current_id(train_iforest_6.MODEL_NAME),
+        ],
+        "params": lambda: {
+            "features": feature_registry.IFOREST_FEATURES,
+            "n_estimators": train_iforest_6.N_ESTIMATORS,
+            "max_samples": train_iforest_6.MAX_SAMPLES,
+            "contamination": train_iforest_6.CONTAMINATION,
+        },
+        "outputs": ["final_output"],
+    },
+    {
+        "name": "aggregate",
+        "label": "Summary",
+        "run": lambda force: aggregate_7.summarize(),
+        "code": ["aggregate_7", "evaluate_model", "records"],
+        "inputs": ["labeled", "final_output"],
+        "params": lambda: {
+            "top_ips": aggregate_7.TOP_IPS,
+            "risk_weights": evaluate_model.RISK_WEIGHTS,
+            "alert_levels": evaluate_model.ALERT_LEVELS,
+        },
+        "outputs": lambda: [aggregate_7.AGGREGATES_FILE],
+    },
+    {
+        "name": "results",
+        "label": "Results",
+        "run": lambda force: results_store.store(force=force),
+        "code": ["results_store", "evaluate_model", "records"],
+        "inputs": ["labeled", "final_output"],
+        "params": lambda: results_store.settings(),
+        # The store keeps the metadata of every run, so it is not restored
+        # from the cache; it skips itself when it already holds these results
+        "cache": False,
+        "outputs": [],
+    },
+]
+
+
+def _items(stage, field):
+    items = stage[field]
+    return items() if callable(items) else items
+
+
+def inputs_of(stage):
+    return _items(stage, "inputs")
+
+
+def outputs_of(stage):
+    return _items(stage, "outputs")
+
+
+def _resolve(item):
+    return frame_store.path_of(item) if item in frame_store.ARTIFACTS else item
+
+
+def _load_index():
+    if os.path.exists(HASH_INDEX):
+        with open(HASH_INDEX) as f:
+            return json.load(f)
+    return {}
+
+
+def _save_index(index):
+    os.makedirs(os.path.dirname(HASH_INDEX), exist_ok=True)
+    with open(HASH_INDEX, "w") as f:
+        json.dump(index, f)
+
+
+def file_digest(path, index=None):
+    """
+    blake2b of a file's content, memoized on (size, mtime) in index.
+    """
+    stat = os.stat(path)
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    if index is not None and index.get(path, [None])[:2] == stamp:
+        return index[path][2]
+
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+
+    digest = h.hexdigest()
+    if index is not None:
+        index[path] = stamp + [digest]
+    return digest
+
+
+def stage_key(stage, produced, index=None):
+    """
+    Fingerprint of a stage: its code, params and the content of its inputs.
+
+    Inputs produced earlier in the same run contribute the producing stage's
+    key instead of being re-hashed.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    h.update(stage["name"].encode())
+
+    for module in stage["code"]:
+        h.update(file_digest(os.path.join(FUNCTION_DIR, module + ".py"), index).encode())
+
+    h.update(json.dumps(stage["params"](), sort_keys=True, default=str).encode())
+
+    for item in inputs_of(stage):
+        if callable(item):
+            h.update(str(item()).encode())
+            continue
+
+        if item in produced:
+            h.update(f"{item}={produced[item]}".encode())
+            continue
+
+        paths = sorted(glob.glob(_resolve(item))) if glob.has_magic(item) else [_resolve(item)]
+        for path in paths:
+            digest = file_digest(path, index) if os.path.exists(path) else "missing"
+            h.update(f"{path}={digest}".encode())
+
+    return h.hexdigest()
+
+
+def _entry_dir(key):
+    return os.path.join(CACHE_DIR, key)
+
+
+def _restore(stage, key):
+    entry = _entry_dir(key)
+    if not os.path.isdir(entry):
+        return False
+
+    for i, item in enumerate(outputs_of(stage)):
+        cached = os.path.join(entry, f"{i}-{os.path.basename(_resolve(item))}")
+        if not os.path.exists(cached):
+            return False
+
+    for i, item in enumerate(outputs_of(stage)):
+        path = _resolve(item)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        shutil.copyfile(os.path.join(entry, f"{i}-{os.path.basename(path)}"), path)
+        frame_store.discard(item)
+
+    # Mark as recently used for eviction
+    os.utime(entry)
+    return True
+
+
+def _store(stage, key):
+    entry = _entry_dir(key)
+    tmp = entry + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    for i, item in enumerate(outputs_of(stage)):
+        path = _resolve(item)
+        if not os.path.exists(path):
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        shutil.copyfile(path, os.path.join(tmp, f"{i}-{os.path.basename(path)}"))
+
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp, entry)
+
+
+def _dir_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def evict(cap=None):
+    """
+    Removes least recently used cache entries until the cache fits in cap.
+    """
+    if cap is None:
+        cap = CACHE_SIZE_CAP
+    if not os.path.isdir(CACHE_DIR):
+        return
+
+    entries = [os.path.join(CACHE_DIR, name) for name in os.listdir(CACHE_DIR)]
+    entries = sorted((os.path.getmtime(e), _dir_size(e), e) for e in entries if os.path.isdir(e))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in entries:
+        if total <= cap:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+
+
+def _rows(items):
+    """
+    Total rows of the frame_store artifacts among items, or None if there are none.
+    """
+    names = [item for item in items if not callable(item) and item in frame_store.ARTIFACTS and frame_store.exists(item)]
+    if not names:
+        return None
+    return sum(frame_store.num_rows(name) for name in names)
+
+
+def run(stages=None, use_cache=True, force=(), on_stage=None, on_metrics=None, profile=None,
+        listener=None, cancel=None):
+    """
+    Runs the stages in order, reusing cached outputs whose fingerprint matches.
+
+    force lists stage names to rerun regardless of the cache; for "train" and
+    "iforest" it also means refit instead of reusing the registered model.
+    on_stage(stage, status, seconds) is called after each stage, with status
+    "ran" or "cached". on_metrics(record) gets the stage's instrument record
+    (wall/CPU time, rows, throughput, peak RSS), and all records are exported
+    per instrument.EXPORT. profile overrides instrument.PROFILE.
+    listener receives progress events and cancel is a progress.CancelToken
+    the phases check between batches (see progress).
+    Returns False as soon as a stage reports failure or the run is cancelled.
+    """
+    if stages is None:
+        stages = STAGES
+
+    index = _load_index()
+    produced = {}
+    records = []
+
+    try:
+        with progress.session(listener, cancel):
+            for i, stage in enumerate(stages):
+                progress.stage(stage["name"], stage["label"], i, len(stages))
+                progress.check()
+
+                with instrument.measure(stage["name"], _rows(inputs_of(stage)), profile) as record:
+                    key = stage_key(stage, produced, index)
+
+                    cacheable = use_cache and stage.get("cache", True)
+                    forced = stage["name"] in force
+
+                    if cacheable and not forced and _restore(stage, key):
+                        status = "cached"
+                    else:
+                        status = "ran" if stage["run"](forced) else "failed"
+                        if status == "ran" and cacheable:
+                            _store(stage, key)
+
+                    record["label"] = stage["label"]
+                    record["status"] = status
+                    if status != "failed":
+                        record["rows_out"] = _rows(outputs_of(stage))
+
+                records.append(record)
+                if on_metrics:
+                    on_metrics(record)
+
+                if status == "failed":
+                    _save_index(index)
+                    return False
+
+                for item in outputs_of(stage):
+                    produced[item] = key
+
+                if on_stage:
+                    on_stage(stage, status, record["wall_s"])
+    except progress.Cancelled:
+        # Outputs are only cached after a stage completes, so a cancelled
+        # stage simply runs again next time
+        print(f"[!] Cancelled during {stage['name']}")
+        _save_index(index)
+        return False
+    finally:
+        instrument.export(records)
+
+    _save_index(index)
+    if use_cache:
+        evict()
+    return True
+
+
+if __name__ == "__main__":
+    # python -m PyLog.function.pipeline [stage to force ...]
+    print(instrument.TABLE_HEADER)
+    run(force=sys.argv[1:], on_metrics=lambda record: print(instrument.format_row(record), record["status"]))
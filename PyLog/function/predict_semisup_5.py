@@ -1,50 +1,110 @@
-import pandas as pd
-import joblib
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+
+from PyLog.function import frame_store
+from PyLog.function import model_registry
+from PyLog.function import progress
+from PyLog.function import train_semisup_4
+
+BATCH_SIZE = 6000   # safe on most machines
+N_JOBS = -1         # every core
+
+# "threading" shares the matrix and output array directly; "loky" runs
+# worker processes that memory-map both instead of receiving copies.
+BACKEND = "threading"
+
+
+def _predict_batch(model, X, out, start, stop):
+    began = time.perf_counter()
+    out[start:stop] = model.predict(X[start:stop])
+    return time.perf_counter() - began
+
+
+def run_batches(model, X, batch_size=BATCH_SIZE, n_jobs=N_JOBS, backend=BACKEND):
+    """
+    Predicts X in batches on a worker pool.
+
+    Returns (predictions, per-batch latency in seconds). Every worker writes
+    its slice straight into one preallocated output array.
+    """
+    n = len(X)
+    dtype = np.asarray(model.classes_).dtype
+    tmp_dir = None
+
+    if backend == "threading":
+        out = np.empty(n, dtype=dtype)
+    else:
+        tmp_dir = tempfile.mkdtemp(prefix="predict_")
+        out = np.memmap(os.path.join(tmp_dir, "predictions.mmap"), dtype=dtype, shape=(n,), mode="w+")
+
+    try:
+        # Results arrive in order as batches finish, which drives progress
+        # events and lets a cancelled run stop dispatching further batches
+        batches = Parallel(n_jobs=n_jobs, backend=backend, mmap_mode="r", return_as="generator")(
+            delayed(_predict_batch)(model, X, out, start, min(start + batch_size, n))
+            for start in range(0, n, batch_size)
+        )
+        latencies = []
+        for latency in batches:
+            latencies.append(latency)
+            progress.report(min(len(latencies) * batch_size, n), n)
+            progress.check()
+        # The memmap is deleted below, so only that case needs a copy
+        predictions = out if tmp_dir is None else np.array(out)
+    finally:
+        if tmp_dir is not None:
+            del out
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return predictions, latencies
+
+
+def latency_summary(latencies):
+    if not latencies:
+        return "no batches"
+    ms = np.asarray(latencies) * 1000
+    return (
+        f"{len(ms)} batches, mean {ms.mean():.1f} ms, "
+        f"p95 {np.percentile(ms, 95):.1f} ms, max {ms.max():.1f} ms"
+    )
+
 
 # Load data, model, scaler
 def predict():
-    df = pd.read_csv("PyLog/Csv/features_semisup/features_semisup.csv")
+    df = frame_store.load("features")
 
-    model = joblib.load("PyLog/Model/semisup_model.joblib")
-    scaler = joblib.load("PyLog/Model/semisup_scaler.joblib")
+    # Scoring only: the pinned (or latest) registered model, memory-mapped
+    train_semisup_4.import_legacy()
+    bundle, meta = model_registry.load(train_semisup_4.MODEL_NAME)
+    model = bundle["model"]
+    scaler = bundle["scaler"]
 
     
-    # Prepare feature matrix
+    # Prepare feature matrix (the model's own schema)
     
-    FEATURES = [
-        "method_enc",
-        "path_len",
-        "path_depth",
-        "has_query",
-        "has_values",
-        "is_php",
-        "is_static",
-        "label"
-    ]
-
-    X_df = df[FEATURES].fillna(0)
+    X_df = df[meta["features"]].fillna(0)
 
     # Convert to NumPy + scale (match training)
-    X_all = scaler.transform(X_df.values)
+    X_all = np.ascontiguousarray(scaler.transform(X_df.values))
 
     
-    # BATCHED PREDICTION (CRITICAL FIX)
+    # PARALLEL BATCHED PREDICTION
     
-    BATCH_SIZE = 6000   # safe on most machines
-    predictions = []
-
-    for i in range(0, len(X_all), BATCH_SIZE):
-        batch = X_all[i:i + BATCH_SIZE]
-        preds = model.predict(batch)
-        predictions.extend(preds)
+    predictions, latencies = run_batches(model, X_all)
 
     df["predicted_label"] = predictions
 
-    df.to_csv("data/output/semisup_output.csv", index=False)
-    print("[+] Semi-supervised prediction complete (batched)")
+    frame_store.save("semisup_output", df)
+    print(f"[+] Semi-supervised prediction complete (batched, v{meta['version']})")
+    print(f"[+] Batch latency: {latency_summary(latencies)}")
     return True
 
 
 
 if __name__ == "__main__":
-    predict()
\ No newline at end of file
+    predict()
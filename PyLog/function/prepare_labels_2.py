@@ -1,55 +1,206 @@
+import re
+import numpy as np
 import pandas as pd
 
-df = pd.read_csv("PyLog/Csv/parsed/parsed.csv")
+from PyLog.function import frame_store
+from PyLog.function import ip_rate
+from PyLog.function import path_memo
+from PyLog.function import progress
+from PyLog.function import records
+
+# Glaspot attack types that are labelled directly
+ATTACK_TYPES = ["sqli", "phpinfo", "xss"]
+
+SQLI_KEYWORDS = [
+    "'", "%27", "--", "union", "select",
+    " or ", "%20or%20", " and ", "%20and%20"
+]
+CMDI_KEYWORDS = ["sleep", "%28", "%29", "ls", "cat", "echo", "/bin/"]
+XSS_KEYWORDS = ["<script", "%3cscript", "<>", "<></>"]
+
+NORMAL_PATHS = ["/", "/style.css", "/robots.txt", "/favicon.ico"]
+
+# (label, substring the path must contain, keywords) in priority order
+RULES = [
+    (9, "?", SQLI_KEYWORDS),   #sqli attack
+    (8, "=", CMDI_KEYWORDS),   #command injuction
+    (5, "=", XSS_KEYWORDS),    #xss
+]
+
+# (minimum requests from one IP, freq_label), highest first
+FREQ_THRESHOLDS = [(100, 3), (30, 2), (10, 1)]
+
+# Seconds of history behind freq_label; None counts the whole log
+FREQ_WINDOW = ip_rate.WINDOW
 
-ip_counts = df["source_ip"].value_counts()
 
 def assign_label(row):
     path = str(row["path"]).lower()
     attack = str(row["attack_type"]).lower()
 
-    if attack in ["sqli", "phpinfo", "xss"]:
+    if attack in ATTACK_TYPES:
         return 1
 
-    if "?" in path and any(x in path for x in [
-        "'", "%27", "--", "union", "select",
-        " or ", "%20or%20", " and ", "%20and%20"
-    ]):
-        return 9  #sqli attack
+    for label, required, keywords in RULES:
+        if required in path and any(x in path for x in keywords):
+            return label
 
-    if "=" in path and any(x in path for x in [
-        "sleep", "%28", "%29", "ls", "cat", "echo", "/bin/"
-    ]):
-        return 8 #command injuction
-
-    if "=" in path and any(x in path for x in [
-        "<script", "%3cscript", "<>", "<></>"
-    ]):
-        return 5 #xss
-
-    if path in ["/", "/style.css", "/robots.txt", "/favicon.ico"]:
+    if path in NORMAL_PATHS:
         return 0 #normal
 
     return -1  #somting abnormal
 
 
-def freq_score(ip):
-    count = ip_counts.get(ip, 0)
-    if count >= 100:
-        return 3
-    elif count >= 30:
-        return 2
-    elif count >= 10:
-        return 1
+def _distinct(column):
+    """
+    codes, values with column == values[codes]; values are strings and
+    NaN reads "nan" (code -1 picks the last value).
+    """
+    codes, uniques = pd.factorize(column)
+    return codes, [str(value) for value in uniques] + ["nan"]
+
+
+def make_labeler(rules=RULES, attack_types=ATTACK_TYPES, normal_paths=NORMAL_PATHS):
+    """
+    Compiles a rule set into a labeler that works on whole columns.
+
+    Each keyword list becomes one combined regex, and the priority order is
+    attack_type, then rules in list order, then normal paths, then -1.
+    Rules are matched once per distinct path / attack_type and the results
+    spread back over the rows; with a path_memo.PathMemo built for this
+    labeler, only paths the memo has not seen are matched at all.
+    """
+    compiled = [
+        (label, required, re.compile("|".join(re.escape(k.lower()) for k in keywords)))
+        for label, required, keywords in rules
+    ]
+    attack_types = [a.lower() for a in attack_types]
+
+    def label_paths(paths):
+        """
+        Label of each path string from the path rules alone.
+        """
+        path = pd.Series(paths, dtype=object).astype(str).str.lower()
+
+        conditions = []
+        choices = []
+
+        required_masks = {}
+        for label, required, pattern in compiled:
+            if required not in required_masks:
+                required_masks[required] = path.str.contains(required, regex=False).to_numpy()
+            candidates = required_masks[required]
+
+            # Only run the keyword scan on paths that passed the cheap check
+            hit = np.zeros(len(path), dtype=bool)
+            if candidates.any():
+                hit[candidates] = path[candidates].str.contains(pattern).to_numpy()
+
+            conditions.append(hit)
+            choices.append(label)
+
+        conditions.append(path.isin(normal_paths).to_numpy())
+        choices.append(0)
+
+        return np.select(conditions, choices, default=-1)
+
+    def labeler(frame, memo=None):
+        path_codes, paths = _distinct(frame["path"])
+        attack_codes, attacks = _distinct(frame["attack_type"])
+
+        if memo is None:
+            by_path = label_paths(paths)
+        else:
+            by_path = np.append(memo.lookup(paths[:-1])[0], label_paths(paths[-1:]))
+        by_attack = pd.Series(attacks).str.lower().isin(attack_types).to_numpy()
+        return np.where(by_attack[attack_codes], 1, by_path[path_codes])
+
+    labeler.vectorized = True
+    labeler.label_paths = label_paths
+    # Identifies the path rules for path_memo
+    labeler.key = repr((rules, normal_paths))
+    return labeler
+
+
+label_frame = make_labeler()
+
+
+def freq_score(ip, counts):
+    """
+    freq_label of one source IP, given the requests per IP of the log.
+    """
+    count = counts.get(ip, 0)
+    for minimum, score in FREQ_THRESHOLDS:
+        if count >= minimum:
+            return score
+    return 0
+
+
+def freq_labels(ips, counts=None):
+    """
+    Vectorized freq_score over a column of source IPs; counts defaults to
+    the requests per IP in the column itself.
+    """
+    if counts is None:
+        counts = ips.value_counts()
+    return freq_from_counts(ips.map(counts).fillna(0).to_numpy())
+
+
+def freq_from_counts(count):
+    """
+    Buckets an array of per-row request counts into freq_label values.
+    """
+    count = np.asarray(count)
+    return np.select(
+        [count >= minimum for minimum, _ in FREQ_THRESHOLDS],
+        [score for _, score in FREQ_THRESHOLDS],
+        default=0
+    )
+
+
+def windowed_freq_labels(df, tracker=None):
+    """
+    freq_label from each IP's request count over the preceding FREQ_WINDOW
+    seconds, using a fixed-memory sketch that can keep being updated.
+    """
+    if tracker is None:
+        tracker = ip_rate.IPRateTracker(window=FREQ_WINDOW)
+
+    counts = tracker.update(
+        df["source_ip"].to_numpy(dtype=np.uint32),
+        records.seconds(df["timestamp"])
+    )
+    return freq_from_counts(counts)
+
+
+def prepare(func=label_frame):
+    """
+    func may be a vectorized labeler (see make_labeler), a list of
+    (label, required, keywords) rules, or a legacy per-row function.
+    """
+    df = frame_store.load("parsed")
+
+    if func is assign_label:
+        func = label_frame
+    elif isinstance(func, (list, tuple)):
+        func = make_labeler(func)
+
+    if getattr(func, "vectorized", False):
+        memo = path_memo.shared(func)
+        df["label"] = func(df, memo)
+        memo.save()
     else:
-        return 0
-def prepare(func=assign_label):
-    df["label"] = df.apply(func, axis=1)
+        df["label"] = df.apply(func, axis=1)
+    progress.report(len(df), 2 * len(df))
+    progress.check()
 
+    if FREQ_WINDOW is None:
+        df["freq_label"] = freq_labels(df["source_ip"])
+    else:
+        df["freq_label"] = windowed_freq_labels(df)
 
-    df["freq_label"] = df["source_ip"].apply(freq_score)
-
-    df.to_csv("PyLog/Csv/labeled/labeled.csv", index=False)
+    progress.report(2 * len(df), 2 * len(df))
+    frame_store.save("labeled", df)
 
     print("Label counts:")
     print(df["label"].value_counts())
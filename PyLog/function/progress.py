@@ -0,0 +1,65 @@
+import threading
+from contextlib import contextmanager
+
+# ------------------------------------------------
+# Progress events and cooperative cancellation for long phases
+# ------------------------------------------------
+# Phases call report() at batch boundaries and check() where stopping is
+# safe. Both are no-ops unless a caller opened a session(), so phases run
+# unchanged from the command line.
+#
+# Events are plain dicts:
+#   {"kind": "stage", "phase": name, "label": label, "index": i, "count": n}
+#   {"kind": "progress", "phase": name, "done": d, "total": t or None, "unit": u}
+# The listener may be called from worker threads (batched prediction), so
+# it should only hand the event on, e.g. queue.Queue.put.
+
+_listener = None
+_token = None
+_phase = None
+
+
+class Cancelled(Exception):
+    """
+    Raised by check() once the session's CancelToken is cancelled.
+    """
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+@contextmanager
+def session(listener=None, token=None):
+    global _listener, _token, _phase
+    previous = _listener, _token, _phase
+    _listener, _token, _phase = listener, token, None
+    try:
+        yield
+    finally:
+        _listener, _token, _phase = previous
+
+
+def stage(name, label, index, count):
+    global _phase
+    _phase = name
+    if _listener is not None:
+        _listener({"kind": "stage", "phase": name, "label": label, "index": index, "count": count})
+
+
+def report(done, total=None, unit="rows", phase=None):
+    if _listener is not None:
+        _listener({"kind": "progress", "phase": phase or _phase, "done": done, "total": total, "unit": unit})
+
+
+def check():
+    if _token is not None and _token.cancelled:
+        raise Cancelled()
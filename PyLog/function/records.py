@@ -0,0 +1,295 @@
+import hashlib
+import json
+import mmap
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from PyLog.function.lazy import lazy_import
+
+# parse_log_1 imports this module; it is only needed here to open logs
+parse_log_1 = lazy_import("PyLog.function.parse_log_1")
+
+# ------------------------------------------------
+# Compact request records carried by the parsed and labeled frames
+# ------------------------------------------------
+#   timestamp     int64 epoch seconds from date + time, NO_TIME if absent
+#   source_ip     uint32 IPv4, 0 if malformed
+#   http_method, attack_type   dictionary (pandas categorical)
+#   path          string; a log can hold millions of distinct paths, too
+#                 many for one dictionary grown batch by batch, so it is
+#                 only dictionary-encoded when read (TEXT_COLUMNS)
+#   status_code   int16, NO_STATUS if absent
+#   raw_file, raw_offset, raw_length   where the line sits in its source
+#                 log (SOURCES_FILE); the text is only read for display
+#                 and export, see readable()
+NO_TIME = np.iinfo(np.int64).min    # the integer behind pandas NaT
+NO_STATUS = 0
+
+SCHEMA = pa.schema([
+    ("timestamp", pa.int64()),
+    ("source_ip", pa.uint32()),
+    ("http_method", pa.dictionary(pa.int8(), pa.string())),
+    ("path", pa.string()),
+    ("attack_type", pa.dictionary(pa.int32(), pa.string())),
+    ("status_code", pa.int16()),
+    ("raw_file", pa.uint16()),
+    ("raw_offset", pa.int64()),
+    ("raw_length", pa.uint32()),
+])
+COLUMNS = SCHEMA.names
+RAW_COLUMNS = ["raw_file", "raw_offset", "raw_length"]
+
+# Stored as plain strings, loaded as categoricals (see frame_store)
+TEXT_COLUMNS = ["path"]
+
+# Source logs in raw_file order, written next to parsed.arrow
+SOURCES_FILE = "PyLog/Csv/parsed/sources.json"
+
+# A source whose size or mtime changed since parsing (a new upload over the
+# same path, or appended lines) is only read if these blocks of the parsed
+# part hash the same: the first, the last and evenly spaced ones between
+DIGEST_BLOCK = 4096
+DIGEST_BLOCKS = 64
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+
+def _numbers(text, start, stop):
+    return pc.cast(pc.utf8_slice_codeunits(text, start, stop), pa.int64()).to_numpy()
+
+
+def epoch(date, time):
+    """
+    date ("01/Jan/2024") + time ("00:00:00") Arrow strings -> int64 epoch
+    seconds; NO_TIME where they do not form a valid timestamp (the rows
+    pandas.to_datetime would turn into NaT).
+
+    The fields have fixed widths, so this is integer arithmetic on slices
+    rather than strptime, which is several times slower.
+    """
+    well_formed = pc.fill_null(pc.and_(
+        pc.match_substring_regex(date, r"^\d{2}/[A-Za-z]{3}/\d{4}$"),
+        pc.match_substring_regex(time, r"^\d{2}:\d{2}:\d{2}$"),
+    ), False)
+    date = pc.if_else(well_formed, date, "01/jan/1970")
+    time = pc.if_else(well_formed, time, "00:00:00")
+
+    month = pc.fill_null(pc.index_in(pc.utf8_lower(pc.utf8_slice_codeunits(date, 3, 6)),
+                                     value_set=pa.array(MONTHS)), -1).to_numpy()
+    year, day = _numbers(date, 7, 11), _numbers(date, 0, 2)
+    hour, minute, second = _numbers(time, 0, 2), _numbers(time, 3, 5), _numbers(time, 6, 8)
+
+    months = (year - 1970) * 12 + np.maximum(month, 0)
+    first = months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    length = (months + 1).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) - first
+
+    # As with strptime, seconds 60 and 61 are accepted and roll over
+    valid = (
+        well_formed.to_numpy(zero_copy_only=False) & (month >= 0) & (year >= 1)
+        & (day >= 1) & (day <= length) & (hour < 24) & (minute < 60) & (second <= 61)
+    )
+    stamp = (first + day - 1) * 86400 + hour * 3600 + minute * 60 + second
+    return np.where(valid, stamp, NO_TIME)
+
+
+def seconds(timestamp):
+    """
+    timestamp column -> float64 epoch seconds with NaN where absent.
+    """
+    timestamp = np.asarray(timestamp, dtype=np.int64)
+    return np.where(timestamp == NO_TIME, np.nan, timestamp)
+
+
+def pack_ips(ips):
+    """
+    Dotted IPv4 Arrow strings -> uint32, 0 where malformed (as ip_rate.pack_ips).
+    """
+    dotted = pc.fill_null(pc.match_substring_regex(ips, r"^\d+\.\d+\.\d+\.\d+$"), False)
+    parts = pc.split_pattern(pc.if_else(dotted, ips, "0.0.0.0"), ".")
+    octets = np.column_stack([
+        pc.cast(pc.list_element(parts, i), pa.float64()).to_numpy(zero_copy_only=False)
+        for i in range(4)
+    ])
+    octets = np.where((octets <= 255).all(axis=1)[:, None], octets, 0).astype(np.uint32)
+    return (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+
+
+def unpack_ips(values):
+    """
+    uint32 column -> dotted IPv4 strings.
+    """
+    values = np.asarray(values, dtype=np.uint32)
+    octets = [pa.array((values >> shift) & 255).cast(pa.string()) for shift in (24, 16, 8, 0)]
+    return pc.binary_join_element_wise(*octets, ".").to_numpy(zero_copy_only=False)
+
+
+def from_text(table):
+    """
+    Text fields of parsed lines (date, time, source_ip, http_method, path,
+    attack_type, status_code) -> the record columns before raw_file.
+    """
+    status = table["status_code"]
+    columns = {
+        "timestamp": pa.array(epoch(table["date"], table["time"]), pa.int64()),
+        "source_ip": pa.array(pack_ips(table["source_ip"]), pa.uint32()),
+        "http_method": pc.dictionary_encode(table["http_method"]),
+        "path": table["path"],
+        "attack_type": pc.dictionary_encode(table["attack_type"]),
+        "status_code": pc.cast(pc.if_else(pc.equal(status, ""), str(NO_STATUS), status), pa.int16()),
+    }
+    fields = [field for field in SCHEMA if field.name in columns]
+    return pa.Table.from_arrays(
+        [pc.cast(columns[field.name], field.type) for field in fields],
+        schema=pa.schema(fields)
+    )
+
+
+def compact_frame(frame):
+    """
+    parse_line rows as a DataFrame -> record columns, keeping raw_log as text
+    (live scoring has the lines at hand already).
+    """
+    text = [c for c in frame.columns if c != "raw_log"]
+    table = pa.Table.from_pandas(frame[text].astype(str), preserve_index=False)
+    records = from_text(table).to_pandas()
+    records["raw_log"] = frame["raw_log"].to_numpy()
+    return records
+
+
+def source_digest(path, size):
+    """
+    blake2b of DIGEST_BLOCKS blocks spread over the first size bytes of path.
+    """
+    last = max(size - DIGEST_BLOCK, 0)
+    starts = sorted({last * i // (DIGEST_BLOCKS - 1) for i in range(DIGEST_BLOCKS)})
+
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for start in starts:
+            f.seek(start)
+            h.update(f.read(min(DIGEST_BLOCK, size - start)))
+    return h.hexdigest()
+
+
+def save_sources(paths, out_file=SOURCES_FILE):
+    sources = []
+    for path in paths:
+        stat = os.stat(path)
+        sources.append({
+            "path": os.path.abspath(path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "digest": source_digest(path, stat.st_size),
+        })
+
+    os.makedirs(os.path.dirname(out_file) or ".", exist_ok=True)
+    with open(out_file, "w") as f:
+        json.dump(sources, f)
+
+
+def load_sources(path=SOURCES_FILE):
+    with open(path) as f:
+        return json.load(f)
+
+
+def check_source(source):
+    """
+    Raises RuntimeError unless the source log still holds the bytes it was
+    parsed from. Plain logs may have grown since; compressed ones must be
+    unchanged.
+    """
+    path = source["path"]
+    stat = os.stat(path) if os.path.exists(path) else None
+    if stat is not None and [stat.st_size, stat.st_mtime_ns] == [source["size"], source.get("mtime_ns")]:
+        return
+
+    compressed = path.endswith((".gz", ".bz2"))
+    if (
+        stat is None
+        or stat.st_size < source["size"]
+        or (compressed and stat.st_size != source["size"])
+        or source.get("digest") != source_digest(path, source["size"])
+    ):
+        raise RuntimeError(f"{path} changed since it was parsed; parse it again to read raw_log")
+
+
+@contextmanager
+def _reader(source):
+    """
+    read(offset, length) over one source log, see check_source.
+    """
+    check_source(source)
+    path = source["path"]
+    compressed = path.endswith((".gz", ".bz2"))
+
+    if compressed:
+        with parse_log_1.open_log(path) as f:
+            def read(offset, length):
+                f.seek(offset)
+                return f.read(length)
+            yield read
+        return
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        yield lambda offset, length: mm[offset:offset + length]
+
+
+def raw_lines(frame, sources=None):
+    """
+    The source line of every row (stripped, like parse_line's raw_log),
+    read through the raw_file / raw_offset / raw_length references.
+    """
+    if sources is None:
+        sources = load_sources()
+
+    files = frame["raw_file"].to_numpy()
+    offsets = frame["raw_offset"].to_numpy()
+    lengths = frame["raw_length"].to_numpy()
+    lines = np.empty(len(frame), dtype=object)
+
+    for file_id in np.unique(files):
+        rows = np.flatnonzero(files == file_id)
+        # In file order, so compressed logs are read front to back once
+        rows = rows[np.argsort(offsets[rows], kind="stable")]
+        with _reader(sources[file_id]) as read:
+            for row in rows:
+                lines[row] = read(int(offsets[row]), int(lengths[row])).decode("utf-8", errors="ignore").strip()
+
+    return lines
+
+
+def readable(frame, sources=None):
+    """
+    Record columns back to the parser's text columns for display and export;
+    raw_log is resolved from the source logs when the frame holds references.
+    Other columns pass through after them.
+    """
+    text = {}
+
+    if "timestamp" in frame:
+        timestamp = frame["timestamp"].to_numpy()
+        known = timestamp != NO_TIME
+        stamps = pd.to_datetime(np.where(known, timestamp, 0), unit="s")
+        text["date"] = np.where(known, stamps.strftime("%d/%b/%Y"), "")
+        text["time"] = np.where(known, stamps.strftime("%H:%M:%S"), "")
+    if "source_ip" in frame:
+        text["source_ip"] = unpack_ips(frame["source_ip"])
+    for column in ["http_method", "path", "attack_type"]:
+        if column in frame:
+            text[column] = frame[column].astype(str).to_numpy()
+    if "status_code" in frame:
+        status = frame["status_code"].to_numpy()
+        text["status_code"] = np.where(status == NO_STATUS, "", status.astype(str))
+    if "raw_log" in frame:
+        text["raw_log"] = frame["raw_log"].to_numpy()
+    elif set(RAW_COLUMNS) <= set(frame.columns):
+        text["raw_log"] = raw_lines(frame, sources)
+
+    out = pd.DataFrame(text, index=frame.index)
+    rest = [c for c in frame.columns if c not in COLUMNS and c not in text]
+    return pd.concat([out, frame[rest]], axis=1)
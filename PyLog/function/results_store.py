@@ -0,0 +1,539 @@
+import argparse
+import calendar
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from PyLog.function import progress
+from PyLog.function.lazy import lazy_import
+
+# The query side (GUI lookups, CLI) only needs sqlite3; storing loads the
+# frames and scoring code
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+evaluate_model = lazy_import("PyLog.function.evaluate_model")
+frame_store = lazy_import("PyLog.function.frame_store")
+model_registry = lazy_import("PyLog.function.model_registry")
+records = lazy_import("PyLog.function.records")
+
+# ------------------------------------------------
+# Indexed results store
+# ------------------------------------------------
+# The scored events of the latest run in one SQLite file, indexed for
+# filtered lookups (source IP, time, alert level, threat type), plus the
+# metadata of every run that stored results. Each store() bulk-loads a new
+# file next to the old one and swaps it in, so readers never see a
+# half-written run.
+STORE_FILE = "data/output/results.sqlite"
+
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CHUNK_ROWS = 200_000
+
+# Rows a query returns unless asked for another limit
+QUERY_LIMIT = 100
+
+# Columns read per artifact; they are row-aligned (see frame_store.iter_aligned)
+SOURCES = {
+    "labeled": [
+        "timestamp", "source_ip", "http_method", "path", "status_code", "attack_type",
+        "raw_file", "raw_offset", "raw_length",
+    ],
+    "final_output": ["label", "predicted_label", "freq_label", "anomaly_score", "behavior_anomaly"],
+}
+
+# Modules whose code decides what is stored
+CODE = ["results_store", "evaluate_model", "records"]
+
+# events.id is the row number in labeled / final_output. timestamp is NULL
+# for lines without one, source_ip the packed IPv4 (records.pack_ips) and
+# raw_* point into the run's source logs like the record columns do.
+SCHEMA_SQL = """
+CREATE TABLE runs (
+    id INTEGER PRIMARY KEY,
+    created TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    first_timestamp INTEGER,
+    last_timestamp INTEGER,
+    seconds REAL,
+    alerts TEXT,
+    sources TEXT,
+    models TEXT,
+    settings TEXT
+);
+CREATE TABLE paths (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL
+);
+CREATE TABLE events (
+    id INTEGER PRIMARY KEY,
+    timestamp INTEGER,
+    source_ip INTEGER NOT NULL,
+    http_method TEXT,
+    path_id INTEGER,
+    status_code INTEGER,
+    attack_type TEXT,
+    label INTEGER,
+    predicted_label INTEGER,
+    freq_label INTEGER,
+    anomaly_score REAL,
+    behavior_anomaly INTEGER,
+    risk_score INTEGER,
+    threat_type TEXT,
+    alert_level TEXT,
+    raw_file INTEGER,
+    raw_offset INTEGER,
+    raw_length INTEGER
+);
+"""
+
+# Built after the bulk load, which is much faster than updating them per
+# insert (with a larger page cache for the sorts). Every filter ends in
+# timestamp so newest-first lookups walk one index range and stop at the
+# limit. ANALYZE samples the indexes so the planner picks between them.
+INDEXES_SQL = """
+PRAGMA cache_size = -262144;
+CREATE INDEX events_ip ON events (source_ip, timestamp);
+CREATE INDEX events_time ON events (timestamp);
+CREATE INDEX events_alert ON events (alert_level, timestamp);
+CREATE INDEX events_threat ON events (threat_type, timestamp);
+PRAGMA analysis_limit = 1000;
+ANALYZE;
+"""
+
+EVENT_COLUMNS = [
+    "id", "timestamp", "source_ip", "http_method", "path_id", "status_code", "attack_type",
+    "label", "predicted_label", "freq_label", "anomaly_score", "behavior_anomaly",
+    "risk_score", "threat_type", "alert_level", "raw_file", "raw_offset", "raw_length",
+]
+
+INSERT_SQL = f"INSERT INTO events VALUES ({', '.join('?' * len(EVENT_COLUMNS))})"
+
+# Query results, in this order (path resolved, IP dotted, time as text)
+RESULT_COLUMNS = [
+    "id", "date", "time", "source_ip", "http_method", "path", "status_code", "attack_type",
+    "label", "predicted_label", "freq_label", "anomaly_score", "behavior_anomaly",
+    "risk_score", "threat_type", "alert_level",
+]
+
+SELECT_SQL = (
+    "SELECT e.id, e.timestamp, e.source_ip, e.http_method, p.path, e.status_code, e.attack_type, "
+    "e.label, e.predicted_label, e.freq_label, e.anomaly_score, e.behavior_anomaly, "
+    "e.risk_score, e.threat_type, e.alert_level, e.raw_file, e.raw_offset, e.raw_length "
+    "FROM events e LEFT JOIN paths p ON p.id = e.path_id"
+)
+
+
+# ------------------------------------------------
+# Writing
+# ------------------------------------------------
+
+def settings():
+    return {
+        "risk_weights": evaluate_model.RISK_WEIGHTS,
+        "alert_levels": evaluate_model.ALERT_LEVELS,
+    }
+
+
+def fingerprint():
+    """
+    Identity of what store() would write: the content of the frames it
+    reads, the code and the risk settings.
+    """
+    from PyLog.function import pipeline
+
+    h = hashlib.blake2b(digest_size=20)
+    for name in SOURCES:
+        h.update(pipeline.file_digest(frame_store.path_of(name)).encode())
+    for module in CODE:
+        h.update(pipeline.file_digest(os.path.join(FUNCTION_DIR, module + ".py")).encode())
+    h.update(json.dumps(settings(), sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _text(series):
+    """
+    Categorical / object column -> list of str, None where missing.
+    """
+    codes, uniques = pd.factorize(series)
+    values = np.array([str(value) for value in uniques] + [None], dtype=object)
+    return values[codes].tolist()
+
+
+def _nullable(values, missing):
+    """
+    Integer column -> list of int, None where it equals missing.
+    """
+    out = values.tolist()
+    for i in np.flatnonzero(values == missing).tolist():
+        out[i] = None
+    return out
+
+
+class _PathIds:
+    """
+    path text -> paths.id, inserting paths the first time they are seen.
+    """
+
+    def __init__(self, con):
+        self.con = con
+        self.ids = {}
+
+    def __call__(self, series):
+        codes, uniques = pd.factorize(series)
+        new = [path for path in uniques if path not in self.ids]
+        if new:
+            start = len(self.ids)
+            self.ids.update((path, start + i) for i, path in enumerate(new))
+            self.con.executemany(
+                "INSERT INTO paths VALUES (?, ?)",
+                ((start + i, str(path)) for i, path in enumerate(new))
+            )
+        ids = np.array([self.ids[path] for path in uniques] + [-1], dtype=np.int64)
+        return _nullable(ids[codes], -1)
+
+
+def _event_rows(df, start, path_ids):
+    timestamp = df["timestamp"].to_numpy(dtype=np.int64)
+    columns = [
+        range(start, start + len(df)),
+        _nullable(timestamp, records.NO_TIME),
+        df["source_ip"].to_numpy(dtype=np.int64).tolist(),
+        _text(df["http_method"]),
+        path_ids(df["path"]),
+        _nullable(df["status_code"].to_numpy(dtype=np.int64), records.NO_STATUS),
+        _text(df["attack_type"]),
+        df["label"].to_numpy(dtype=np.int64).tolist(),
+        df["predicted_label"].to_numpy(dtype=np.int64).tolist(),
+        df["freq_label"].to_numpy(dtype=np.int64).tolist(),
+        df["anomaly_score"].to_numpy(dtype=np.float64).tolist(),
+        df["behavior_anomaly"].to_numpy(dtype=np.int64).tolist(),
+        df["risk_score"].to_numpy(dtype=np.int64).tolist(),
+        df["threat_type"].tolist(),
+        df["alert_level"].tolist(),
+        df["raw_file"].to_numpy(dtype=np.int64).tolist(),
+        df["raw_offset"].to_numpy(dtype=np.int64).tolist(),
+        df["raw_length"].to_numpy(dtype=np.int64).tolist(),
+    ]
+    return zip(*columns)
+
+
+def _latest_fingerprint(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with _connect(path) as con:
+            row = con.execute("SELECT fingerprint FROM runs ORDER BY id DESC LIMIT 1").fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def _models():
+    from PyLog.function import train_iforest_6
+    from PyLog.function import train_semisup_4
+
+    return {
+        name: model_registry.current_id(name)
+        for name in (train_semisup_4.MODEL_NAME, train_iforest_6.MODEL_NAME)
+    }
+
+
+def store(out_file=STORE_FILE, chunk_rows=CHUNK_ROWS, force=False):
+    """
+    Bulk-loads the scored events of the final output into the store, one
+    transaction per chunk, unless it already holds exactly these results.
+    """
+    key = fingerprint()
+    if not force and _latest_fingerprint(out_file) == key:
+        print("[+] Results store is current, storing skipped")
+        return True
+
+    started = time.perf_counter()
+    os.makedirs(os.path.dirname(out_file) or ".", exist_ok=True)
+    tmp = out_file + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    con = sqlite3.connect(tmp)
+    try:
+        # A fresh file that only replaces the store once complete: no journal needed
+        con.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + SCHEMA_SQL)
+
+        # Keep the metadata of earlier runs
+        if os.path.exists(out_file):
+            try:
+                con.execute("ATTACH DATABASE ? AS old", (out_file,))
+                con.execute("INSERT INTO runs SELECT * FROM old.runs")
+                con.commit()
+                con.execute("DETACH DATABASE old")
+            except sqlite3.Error as e:
+                con.rollback()
+                print(f"[!] Earlier runs not kept: {e}")
+
+        path_ids = _PathIds(con)
+        total = frame_store.num_rows("final_output")
+        rows = 0
+        first = last = None
+        alerts = {}
+
+        for df in frame_store.iter_aligned(SOURCES, chunk_rows):
+            evaluate_model.score_frame(df)
+            with con:
+                con.executemany(INSERT_SQL, _event_rows(df, rows, path_ids))
+            rows += len(df)
+
+            timestamp = df["timestamp"].to_numpy()
+            timestamp = timestamp[timestamp != records.NO_TIME]
+            if len(timestamp):
+                first = int(timestamp.min()) if first is None else min(first, int(timestamp.min()))
+                last = int(timestamp.max()) if last is None else max(last, int(timestamp.max()))
+            for level, count in df["alert_level"].value_counts().items():
+                alerts[level] = alerts.get(level, 0) + int(count)
+
+            progress.report(rows, total)
+            progress.check()
+
+        con.executescript(INDEXES_SQL)
+
+        sources = records.load_sources() if os.path.exists(records.SOURCES_FILE) else []
+        with con:
+            con.execute(
+                "INSERT INTO runs (created, fingerprint, rows, first_timestamp, last_timestamp, "
+                "seconds, alerts, sources, models, settings) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    time.strftime("%Y-%m-%d %H:%M:%S"), key, rows, first, last,
+                    round(time.perf_counter() - started, 3), json.dumps(alerts),
+                    json.dumps(sources), json.dumps(_models()), json.dumps(settings()),
+                )
+            )
+    except BaseException:
+        con.close()
+        os.remove(tmp)
+        raise
+    con.close()
+
+    os.replace(tmp, out_file)
+    print(f"[+] {rows} events stored in {out_file}")
+    return True
+
+
+# ------------------------------------------------
+# Querying
+# ------------------------------------------------
+
+def _connect(path=STORE_FILE):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No results store at {path}; run the pipeline first")
+    # Read-only: lookups never lock out the next store()
+    return sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+
+
+def pack_ip(ip):
+    """
+    Dotted IPv4 (or its packed integer) -> the integer stored in source_ip.
+    """
+    if isinstance(ip, int):
+        return ip
+    octets = [int(part) for part in ip.split(".")]
+    if len(octets) != 4 or not all(0 <= octet <= 255 for octet in octets):
+        raise ValueError(f"Not an IPv4 address: {ip!r}")
+    return (octets[0] << 24) | (octets[1] << 16) | (octets[2] << 8) | octets[3]
+
+
+def unpack_ip(value):
+    return ".".join(str((value >> shift) & 255) for shift in (24, 16, 8, 0))
+
+
+def to_timestamp(value):
+    """
+    Epoch seconds, or log time text ("01/Jan/2024:10:00:00") -> epoch seconds
+    on the same clock as the stored timestamps.
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if value.isdigit():
+        return int(value)
+    return calendar.timegm(time.strptime(value, "%d/%b/%Y:%H:%M:%S"))
+
+
+def _list(value):
+    return [value] if isinstance(value, (str, int)) else list(value)
+
+
+def _where(con, ip=None, since=None, until=None, last=None, alert_level=None,
+           threat_type=None, min_risk=None, predicted_label=None):
+    clauses, params = [], []
+
+    if last is not None:
+        # Relative to the newest stored event rather than the wall clock,
+        # since logs are usually analysed after the fact
+        newest = con.execute("SELECT MAX(timestamp) FROM events").fetchone()[0]
+        since = None if newest is None else newest - last
+
+    if ip is not None:
+        ips = [pack_ip(value) for value in _list(ip)]
+        clauses.append(f"e.source_ip IN ({', '.join('?' * len(ips))})")
+        params += ips
+    if since is not None:
+        clauses.append("e.timestamp >= ?")
+        params.append(to_timestamp(since))
+    if until is not None:
+        clauses.append("e.timestamp <= ?")
+        params.append(to_timestamp(until))
+    for column, value in [("alert_level", alert_level), ("threat_type", threat_type),
+                          ("predicted_label", predicted_label)]:
+        if value is not None:
+            values = _list(value)
+            clauses.append(f"e.{column} IN ({', '.join('?' * len(values))})")
+            params += values
+    if min_risk is not None:
+        clauses.append("e.risk_score >= ?")
+        params.append(min_risk)
+
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _result(row):
+    event = dict(zip(RESULT_COLUMNS, (row[0], None, None) + row[2:15]))
+    if row[1] is None:
+        event["date"] = event["time"] = ""
+    else:
+        stamp = time.gmtime(row[1])
+        event["date"] = time.strftime("%d/%b/%Y", stamp)
+        event["time"] = time.strftime("%H:%M:%S", stamp)
+    event["source_ip"] = unpack_ip(row[2])
+    return event
+
+
+def query(path=STORE_FILE, limit=QUERY_LIMIT, offset=0, raw=False, **filters):
+    """
+    Stored events matching every given filter, newest first, as dicts with
+    RESULT_COLUMNS (and raw_log when raw=True, read from the source logs).
+
+    Filters: ip (dotted, or a list), since / until (epoch seconds or log
+    time text), last (seconds before the newest stored event), alert_level,
+    threat_type and predicted_label (a value or a list), min_risk.
+    """
+    with _connect(path) as con:
+        where, params = _where(con, **filters)
+        rows = con.execute(
+            f"{SELECT_SQL}{where} ORDER BY e.timestamp DESC, e.id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+
+    events = [_result(row) for row in rows]
+    if raw and rows:
+        refs = pd.DataFrame([row[15:18] for row in rows], columns=records.RAW_COLUMNS)
+        for event, line in zip(events, records.raw_lines(refs)):
+            event["raw_log"] = line
+    return events
+
+
+def count(path=STORE_FILE, **filters):
+    """
+    Number of stored events matching the filters (see query).
+    """
+    with _connect(path) as con:
+        where, params = _where(con, **filters)
+        return con.execute(f"SELECT COUNT(*) FROM events e{where}", params).fetchone()[0]
+
+
+def runs(path=STORE_FILE):
+    """
+    Metadata of every run that stored results, newest first.
+    """
+    with _connect(path) as con:
+        con.row_factory = sqlite3.Row
+        rows = con.execute("SELECT * FROM runs ORDER BY id DESC").fetchall()
+
+    out = []
+    for row in rows:
+        run = dict(row)
+        for column in ["alerts", "sources", "models", "settings"]:
+            run[column] = json.loads(run[column]) if run[column] else None
+        out.append(run)
+    return out
+
+
+# ------------------------------------------------
+# CLI
+#   python -m PyLog.function.results_store query --ip 1.2.3.4 --level high --last 1h
+#   python -m PyLog.function.results_store count --threat attack
+#   python -m PyLog.function.results_store runs
+#   python -m PyLog.function.results_store store [--force]
+# ------------------------------------------------
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def duration(text):
+    """
+    "90", "90s", "15m", "1h", "2d" -> seconds.
+    """
+    if text[-1:] in DURATION_UNITS:
+        return int(text[:-1]) * DURATION_UNITS[text[-1]]
+    return int(text)
+
+
+def _filters(args):
+    return {
+        "ip": args.ip,
+        "since": args.since,
+        "until": args.until,
+        "last": args.last,
+        "alert_level": args.level,
+        "threat_type": args.threat,
+        "min_risk": args.min_risk,
+    }
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description="Look up scored events in the results store")
+    cli.add_argument("--store", default=STORE_FILE)
+    commands = cli.add_subparsers(dest="command", required=True)
+
+    for name in ("query", "count"):
+        command = commands.add_parser(name)
+        command.add_argument("--ip", action="append", help="source IP (repeatable)")
+        command.add_argument("--since", help='log time ("01/Jan/2024:10:00:00") or epoch seconds')
+        command.add_argument("--until", help='log time ("01/Jan/2024:11:00:00") or epoch seconds')
+        command.add_argument("--last", type=duration, help="e.g. 1h: before the newest event")
+        command.add_argument("--level", action="append", help="alert level: high, medium, none")
+        command.add_argument("--threat", action="append", help="threat type: attack, recon, normal")
+        command.add_argument("--min-risk", type=int)
+        if name == "query":
+            command.add_argument("--limit", type=int, default=QUERY_LIMIT)
+            command.add_argument("--raw", action="store_true", help="include the raw log line")
+    commands.add_parser("runs")
+    commands.add_parser("store").add_argument("--force", action="store_true")
+
+    args = cli.parse_args(argv)
+    if args.command == "store":
+        return 0 if store(args.store, force=args.force) else 1
+
+    started = time.perf_counter()
+
+    if args.command == "query":
+        events = query(args.store, limit=args.limit, raw=args.raw, **_filters(args))
+        for event in events:
+            print(json.dumps(event))
+        found = f"{len(events)} events"
+    elif args.command == "count":
+        found = f"{count(args.store, **_filters(args))} events"
+        print(found)
+    else:
+        for run in runs(args.store):
+            print(json.dumps(run))
+        found = "runs listed"
+
+    print(f"[+] {found} in {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
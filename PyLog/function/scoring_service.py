@@ -0,0 +1,465 @@
+import argparse
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from PyLog.function.lazy import lazy_import
+
+# The models and their libraries load in ScoringService(), so the client
+# side and `serve --help` start instantly
+live_tail = lazy_import("PyLog.function.live_tail")
+distill_semisup = lazy_import("PyLog.function.distill_semisup")
+model_registry = lazy_import("PyLog.function.model_registry")
+parse_log_1 = lazy_import("PyLog.function.parse_log_1")
+records = lazy_import("PyLog.function.records")
+train_iforest_6 = lazy_import("PyLog.function.train_iforest_6")
+train_semisup_4 = lazy_import("PyLog.function.train_semisup_4")
+
+# ------------------------------------------------
+# Headless scoring service: warm models behind a local HTTP API
+# ------------------------------------------------
+HOST = "127.0.0.1"
+PORT = 8765
+WORKERS = 2               # jobs scored at the same time
+BATCH_LINES = 5000        # lines per scoring batch; results stream per batch
+
+# Scored batches a job holds for its reader. A full queue pauses the job's
+# worker; if nobody reads for STALL_SECONDS the job is dropped.
+RESULT_BATCHES = 8
+STALL_SECONDS = 60
+
+# Seconds a finished job keeps its results for GET /jobs/<id>/results
+JOB_TTL = 600
+
+# Columns returned for every scored row on top of live_tail.ALERT_COLUMNS
+# ("alerts" requests get the same columns, restricted to rows at or above
+# live_tail.ALERT_MIN_RISK)
+EXTRA_COLUMNS = ["label", "freq_label", "behavior_anomaly", "threat_type", "alert_level"]
+
+
+class Job:
+    def __init__(self, source, alerts_only=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.alerts_only = alerts_only
+        self.status = "queued"
+        self.error = None
+        self.lines = 0
+        self.rows = 0
+        self.scoring_seconds = 0.0
+        self.submitted = time.time()
+        self.finished = None
+        self.results = queue.Queue(maxsize=RESULT_BATCHES)
+        self.reading = False
+        # Set once the job is forgotten; its worker stops at the next batch
+        self.dropped = threading.Event()
+
+    def info(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "lines": self.lines,
+            "rows": self.rows,
+            "scoring_ms": round(self.scoring_seconds * 1000, 1),
+        }
+
+    def put(self, rows, timeout=None):
+        """
+        Queues a batch for the reader, waiting while the queue is full.
+        False if the job was dropped or nobody read within timeout.
+        """
+        if timeout is None:
+            timeout = STALL_SECONDS
+        deadline = time.monotonic() + timeout
+        while not self.dropped.is_set():
+            try:
+                self.results.put(rows, timeout=0.5)
+                return True
+            except queue.Full:
+                if time.monotonic() >= deadline:
+                    return False
+        return False
+
+    def stream(self):
+        """
+        Yields lists of result dicts as batches finish. Results are handed
+        out once, to the first reader.
+        """
+        while True:
+            try:
+                yield self.results.get(timeout=0.5)
+            except queue.Empty:
+                # finished is set after the last put, so empty is final then
+                if self.finished is not None and self.results.empty():
+                    return
+
+
+def _file_batches(path, batch_lines):
+    with parse_log_1.open_log(path) as f:
+        batch = []
+        for raw in f:
+            batch.append(raw.decode("utf-8", errors="ignore"))
+            if len(batch) >= batch_lines:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _line_batches(lines, batch_lines):
+    for start in range(0, len(lines), batch_lines):
+        yield lines[start:start + batch_lines]
+
+
+class ScoringService:
+    """
+    Loads the scaler, semi-supervised model and forest once and scores jobs
+    on a thread pool. Each job keeps its own per-IP rate window.
+    """
+
+    def __init__(self, workers=WORKERS, batch_lines=BATCH_LINES, models=None):
+        started = time.perf_counter()
+        self.models = models or live_tail.load_models()
+        self.versions = {
+            name: model_registry.current_version(name)
+            for name in (train_semisup_4.MODEL_NAME, train_iforest_6.MODEL_NAME)
+        }
+        # Distilled version serving the semi-supervised one, None if not used
+        self.versions[distill_semisup.MODEL_NAME] = self.models.get("distilled")
+        self.batch_lines = batch_lines
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="score")
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+        # One throwaway batch so the first real request pays no first-call costs
+        live_tail.Scorer(self.models).score_lines([
+            '127.0.0.1 - - [01/Jan/2024:00:00:00 +0000] "GET / HTTP/1.1" 200 1'
+        ])
+        self.startup_seconds = time.perf_counter() - started
+
+    def submit(self, batches, source, alerts_only=False):
+        job = Job(source, alerts_only)
+        with self.lock:
+            self._expire()
+            self.jobs[job.id] = job
+        self.pool.submit(self._run, job, batches)
+        return job
+
+    def submit_lines(self, lines, alerts_only=False):
+        return self.submit(_line_batches(lines, self.batch_lines), "lines", alerts_only)
+
+    def submit_file(self, path, alerts_only=False):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"No such log file: {path}")
+        return self.submit(_file_batches(path, self.batch_lines), path, alerts_only)
+
+    def _run(self, job, batches):
+        if job.dropped.is_set():
+            return
+        job.status = "running"
+        scorer = live_tail.Scorer(self.models)
+        columns = live_tail.ALERT_COLUMNS + EXTRA_COLUMNS
+        stalled = False
+        try:
+            for lines in batches:
+                if job.dropped.is_set():
+                    break
+                start = time.perf_counter()
+                scored = scorer.score_lines(lines)
+                job.scoring_seconds += time.perf_counter() - start
+                job.lines += len(lines)
+
+                if scored.empty:
+                    continue
+                if job.alerts_only:
+                    scored = scored[scored["risk_score"] >= live_tail.ALERT_MIN_RISK]
+
+                rows = records.readable(scored)[columns].to_dict("records")
+                job.rows += len(rows)
+                if rows and not job.put(rows):
+                    stalled = not job.dropped.is_set()
+                    break
+
+            if stalled:
+                job.status = "expired"
+                job.error = f"results not read within {STALL_SECONDS}s"
+                self.forget(job.id)
+            elif job.dropped.is_set():
+                job.status = "cancelled"
+            else:
+                job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished = time.time()
+
+    def _expire(self):
+        """
+        Drops finished jobs nobody fetched within JOB_TTL (lock held).
+        """
+        now = time.time()
+        for job in list(self.jobs.values()):
+            if job.finished is not None and not job.reading and now - job.finished > JOB_TTL:
+                del self.jobs[job.id]
+                job.dropped.set()
+
+    def job(self, job_id):
+        with self.lock:
+            self._expire()
+            return self.jobs.get(job_id)
+
+    def claim(self, job):
+        """
+        Marks the job as being read; False if another reader has it.
+        """
+        with self.lock:
+            if job.reading:
+                return False
+            job.reading = True
+            return True
+
+    def forget(self, job_id):
+        with self.lock:
+            job = self.jobs.pop(job_id, None)
+        if job is not None:
+            job.dropped.set()
+
+    def health(self):
+        with self.lock:
+            self._expire()
+            active = sum(job.status in ("queued", "running") for job in self.jobs.values())
+        return {
+            "status": "ok",
+            "models": self.versions,
+            "startup_ms": round(self.startup_seconds * 1000, 1),
+            "active_jobs": active,
+        }
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ------------------------------------------------
+# HTTP API
+#   GET  /health
+#   POST /score[?alerts=1]        body: log lines; streams NDJSON results
+#   POST /jobs[?alerts=1]         body: {"path": "..."} or log lines; returns job info
+#   GET  /jobs/<id>               job info
+#   GET  /jobs/<id>/results       streams NDJSON results (once)
+# Every streamed response ends with a {"job": {...}} summary line.
+# ------------------------------------------------
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, job):
+        if not self.service.claim(job):
+            return self._json(409, {"error": "results are already being read"})
+
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            for rows in job.stream():
+                self._chunk("".join(json.dumps(row, default=str) + "\n" for row in rows).encode())
+            self._chunk((json.dumps({"job": job.info()}) + "\n").encode())
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away; forgetting the job stops its worker
+            self.close_connection = True
+        finally:
+            self.service.forget(job.id)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length)
+
+    def _submit(self, query):
+        body = self._body()
+        alerts_only = query.get("alerts", ["0"])[0] in ("1", "true")
+
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            path = json.loads(body or b"{}").get("path")
+            if not path:
+                raise ValueError("JSON body needs a 'path'")
+            return self.service.submit_file(path, alerts_only)
+
+        lines = body.decode("utf-8", errors="ignore").splitlines()
+        return self.service.submit_lines(lines, alerts_only)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+
+        if parts == ["health"]:
+            return self._json(200, self.service.health())
+
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.service.job(parts[1])
+            if job is None:
+                return self._json(404, {"error": "unknown job"})
+            if len(parts) == 2:
+                return self._json(200, job.info())
+            if parts[2] == "results":
+                return self._stream(job)
+
+        self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        try:
+            if url.path == "/score":
+                return self._stream(self._submit(query))
+            if url.path == "/jobs":
+                return self._json(202, self._submit(query).info())
+        except (ValueError, FileNotFoundError) as e:
+            return self._json(400, {"error": str(e)})
+
+        self._json(404, {"error": "not found"})
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects an (host, port) client address
+        return request, ("local", 0)
+
+
+def make_server(service, host=HOST, port=PORT, unix_socket=None):
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = UnixHTTPServer(unix_socket, Handler)
+    else:
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def serve(host=HOST, port=PORT, unix_socket=None, workers=WORKERS):
+    service = ScoringService(workers=workers)
+    server = make_server(service, host, port, unix_socket)
+    where = unix_socket or f"http://{host}:{port}"
+    print(f"[+] Scoring service ready on {where} (models {service.versions}, warm in {service.startup_seconds:.1f}s)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+
+
+# ------------------------------------------------
+# Client
+# ------------------------------------------------
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.unix_path)
+
+
+def connect(host=HOST, port=PORT, unix_socket=None):
+    if unix_socket:
+        return UnixHTTPConnection(unix_socket)
+    return http.client.HTTPConnection(host, port)
+
+
+def submit(source, conn, alerts_only=False):
+    """
+    Scores a log file (path readable by the service) or "-" for stdin and
+    yields result dicts as they stream back. The last item is the job summary.
+    """
+    query = "?alerts=1" if alerts_only else ""
+    if source == "-":
+        conn.request("POST", "/score" + query, body=sys.stdin.buffer.read(),
+                     headers={"Content-Type": "text/plain"})
+        response = conn.getresponse()
+    else:
+        conn.request("POST", "/jobs" + query, body=json.dumps({"path": os.path.abspath(source)}),
+                     headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        info = json.loads(response.read())
+        if response.status != 202:
+            raise RuntimeError(info.get("error", response.reason))
+        conn.request("GET", f"/jobs/{info['id']}/results")
+        response = conn.getresponse()
+
+    if response.status != 200:
+        raise RuntimeError(json.loads(response.read()).get("error", response.reason))
+
+    for line in response:
+        if line.strip():
+            yield json.loads(line)
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Headless PyLog scoring service")
+    commands = cli.add_subparsers(dest="command", required=True)
+
+    for name in ("serve", "submit"):
+        command = commands.add_parser(name)
+        command.add_argument("--host", default=HOST)
+        command.add_argument("--port", type=int, default=PORT)
+        command.add_argument("--unix", help="Unix socket path instead of TCP")
+
+    commands.choices["serve"].add_argument("--workers", type=int, default=WORKERS)
+    commands.choices["submit"].add_argument("source", help="log file, or - for lines on stdin")
+    commands.choices["submit"].add_argument("--alerts", action="store_true", help="only rows at alert level")
+    args = cli.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.unix, args.workers)
+    else:
+        try:
+            for item in submit(args.source, connect(args.host, args.port, args.unix), args.alerts):
+                print(json.dumps(item, default=str), flush=True)
+        except (OSError, RuntimeError) as e:
+            print(f"[!] {e}", file=sys.stderr)
+            sys.exit(1)
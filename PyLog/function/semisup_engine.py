@@ -0,0 +1,102 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.neighbors import NearestNeighbors
+
+from PyLog.function import progress
+
+
+class KNNLabelSpreading(ClassifierMixin, BaseEstimator):
+    """
+    Label spreading over a sparse k-nearest-neighbour graph.
+
+    Drop-in for sklearn's LabelSpreading (fit / predict / predict_proba,
+    -1 marks unlabeled rows), but memory grows with n * n_neighbors instead
+    of n * n, and predict() is a neighbour query against a tree index
+    instead of a dense kernel block against every training row.
+
+    Graph components without a labeled row receive no label mass; their
+    rows take the label of the nearest labeled row instead (n_unreached_
+    counts them), so they never default to the first class.
+    """
+
+    def __init__(self, n_neighbors=10, alpha=0.2, max_iter=30, tol=1e-3,
+                 algorithm="auto", n_jobs=None):
+        self.n_neighbors = n_neighbors
+        self.alpha = alpha
+        self.max_iter = max_iter
+        self.tol = tol
+        self.algorithm = algorithm
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+
+        labeled = y != -1
+        n = len(X)
+        if n < 2:
+            raise ValueError(f"Label spreading needs at least 2 rows, got {n}")
+        if not labeled.any():
+            raise ValueError("Label spreading needs at least one labeled row (y != -1)")
+        self.classes_ = np.unique(y[labeled])
+
+        k = min(self.n_neighbors, n - 1)
+        self.nn_ = NearestNeighbors(
+            n_neighbors=k,
+            algorithm=self.algorithm,
+            n_jobs=self.n_jobs
+        ).fit(X)
+
+        # Symmetric kNN graph, normalized as D^-1/2 W D^-1/2
+        graph = self.nn_.kneighbors_graph(mode="connectivity").astype(np.float32)
+        graph = graph.maximum(graph.T).tocsr()
+
+        degree = np.asarray(graph.sum(axis=1)).ravel()
+        degree[degree == 0] = 1.0
+        scale = sp.diags(1.0 / np.sqrt(degree)).astype(np.float32)
+        graph = (scale @ graph @ scale).tocsr()
+
+        # Clamped one-hot seeds for the labeled rows
+        seeds = np.zeros((n, len(self.classes_)), dtype=np.float32)
+        seeds[np.flatnonzero(labeled), np.searchsorted(self.classes_, y[labeled])] = 1.0
+
+        dist = seeds.copy()
+        self.n_iter_ = 0
+        for self.n_iter_ in range(1, self.max_iter + 1):
+            previous = dist
+            dist = self.alpha * (graph @ dist) + (1 - self.alpha) * seeds
+            if np.abs(dist - previous).sum() < self.tol:
+                break
+            progress.report(self.n_iter_, self.max_iter, "iterations")
+            progress.check()
+
+        # Rows in components no labeled row reaches: nearest labeled row's label
+        unreached = np.flatnonzero(dist.sum(axis=1) == 0)
+        self.n_unreached_ = len(unreached)
+        if len(unreached):
+            nearest = NearestNeighbors(
+                n_neighbors=1,
+                algorithm=self.algorithm,
+                n_jobs=self.n_jobs
+            ).fit(X[labeled])
+            closest = nearest.kneighbors(X[unreached], return_distance=False)[:, 0]
+            dist[unreached] = seeds[np.flatnonzero(labeled)[closest]]
+
+        self.label_distributions_ = self._normalize(dist)
+        self.transduction_ = self.classes_[np.argmax(self.label_distributions_, axis=1)]
+        return self
+
+    @staticmethod
+    def _normalize(dist):
+        total = dist.sum(axis=1, keepdims=True)
+        total[total == 0] = 1.0
+        return dist / total
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        neighbours = self.nn_.kneighbors(X, return_distance=False)
+        return self._normalize(self.label_distributions_[neighbours].sum(axis=1))
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
@@ -1,36 +1,120 @@
-import pandas as pd
-from sklearn.ensemble import IsolationForest
-import joblib
-
-def iforest():
-    df = pd.read_csv("data/output/semisup_output.csv")
-    behavior_features = df[
-        [
-            "path_len",
-            "path_depth",
-            "has_query",
-            "has_values",
-            "label",
-            "predicted_label",
-            "is_static",
-            "freq_label"
-        ]
-    ]
+import numpy as np
+from joblib import Parallel, delayed
+
+from PyLog.function import frame_store
+from PyLog.function import model_registry
+from PyLog.function import progress
+from PyLog.function.feature_registry import BEHAVIOR_FEATURES, IFOREST_FEATURES
+
+MODEL_NAME = "iforest"
+
+N_ESTIMATORS = 8000
+MAX_SAMPLES = 256      # rows per tree, bounded regardless of input size
+CONTAMINATION = 0.5
+
+N_JOBS = -1            # tree building and chunked scoring use every core
+SCORE_CHUNK = 20000
+
+# Trees are grown in steps of this many (warm start) so long fits report
+# progress and can be cancelled; the result equals a single fit.
+FIT_STEP = 500
+
+
+def fit(behavior_features):
+    """
+    Fits a new forest, registers it and returns (model, version).
+    """
+    from sklearn.ensemble import IsolationForest
 
     model = IsolationForest(
-        n_estimators=8000,
-        contamination=0.5,
-        random_state=300
+        n_estimators=N_ESTIMATORS,
+        max_samples=MAX_SAMPLES,
+        contamination=CONTAMINATION,
+        n_jobs=N_JOBS,
+        random_state=300,
+        warm_start=True
+    )
+
+    # Intermediate steps skip the contamination threshold, which would
+    # otherwise score the whole frame after every step
+    for n in range(FIT_STEP, N_ESTIMATORS, FIT_STEP):
+        model.set_params(n_estimators=n, contamination="auto").fit(behavior_features)
+        progress.report(n, N_ESTIMATORS, "trees")
+        progress.check()
+
+    model.set_params(n_estimators=N_ESTIMATORS, contamination=CONTAMINATION).fit(behavior_features)
+    model.set_params(warm_start=False)
+    progress.report(N_ESTIMATORS, N_ESTIMATORS, "trees")
+
+    version = model_registry.register(
+        MODEL_NAME,
+        model,
+        IFOREST_FEATURES,
+        model_registry.fingerprint(behavior_features),
+        model_registry.feature_stats(behavior_features.values),
+        params=model.get_params()
     )
+    return model, version
+
+
+def _score_chunk(model, X, out, start, stop):
+    out[start:stop] = model.decision_function(X[start:stop])
+
+
+def score(model, behavior_features, chunk_size=SCORE_CHUNK, n_jobs=N_JOBS):
+    """
+    decision_function over row chunks in parallel, into one preallocated array.
+
+    Negative values are anomalies, matching IsolationForest.predict().
+    """
+    X = np.ascontiguousarray(behavior_features.values, dtype=np.float32)
+    out = np.empty(len(X), dtype=np.float64)
+
+    chunks = Parallel(n_jobs=n_jobs, backend="threading", return_as="generator")(
+        delayed(_score_chunk)(model, X, out, start, min(start + chunk_size, len(X)))
+        for start in range(0, len(X), chunk_size)
+    )
+    for i, _ in enumerate(chunks, 1):
+        progress.report(min(i * chunk_size, len(X)), len(X))
+        progress.check()
+    return out
+
+
+def iforest(mode="auto", force=False):
+    """
+    mode "fit" always fits a new forest, "score" only scores with the
+    registered one, and "auto" fits when forced, missing or drifted.
+    """
+    df = frame_store.load("semisup_output")
+    behavior = frame_store.load("behavior", columns=BEHAVIOR_FEATURES)
+    if len(behavior) != len(df):
+        raise ValueError(f"behavior has {len(behavior)} rows, semisup_output {len(df)}")
+    df[BEHAVIOR_FEATURES] = behavior
+    behavior_features = df[IFOREST_FEATURES]
+
+    if mode == "auto":
+        refit = force or model_registry.needs_training(MODEL_NAME, IFOREST_FEATURES, behavior_features.values)
+        mode = "fit" if refit else "score"
+
+    if mode == "fit":
+        model, version = fit(behavior_features)
+        print(f"[+] IsolationForest fitted (v{version})")
+    elif mode == "score":
+        model, meta = model_registry.load(MODEL_NAME)
+        print(f"[+] IsolationForest v{meta['version']} reused")
+    else:
+        raise ValueError(f"Unknown iforest mode: {mode!r}")
 
-    df["behavior_anomaly"] = model.fit_predict(behavior_features)
+    decision = score(model, behavior_features)
 
-    joblib.dump(model, "PyLog/Model/iforest_model.joblib")
+    # Higher = more anomalous, for ranking; the flag keeps its -1 / 1 meaning
+    df["anomaly_score"] = -decision
+    df["behavior_anomaly"] = np.where(decision < 0, -1, 1)
 
-    df.to_csv("data/output/final_output.csv", index=False)
+    frame_store.save("final_output", df)
     print("[+] Final output generated")
     return True
 
 
 if __name__ == "__main__":
-    iforest()
\ No newline at end of file
+    iforest(mode="fit")
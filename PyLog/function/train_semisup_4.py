@@ -1,51 +1,107 @@
-import pandas as pd
-from sklearn.semi_supervised import LabelSpreading
-from sklearn.preprocessing import StandardScaler
-from sklearn.utils import resample
+import os
+
 import joblib
 
+from PyLog.function import frame_store
+from PyLog.function import model_registry
+from PyLog.function.feature_registry import SEMISUP_FEATURES
+
+MODEL_NAME = "semisup"
+
+# None trains on every row; the sparse kNN graph keeps memory linear in rows
+TRAIN_SIZE = None
+N_NEIGHBORS = 10
+
+# Files shipped with the repo before the registry existed
+LEGACY_MODEL = "PyLog/Model/semisup_model.joblib"
+LEGACY_SCALER = "PyLog/Model/semisup_scaler.joblib"
+
+
+def import_legacy():
+    """
+    Registers the shipped model + scaler as version 1 of an empty registry.
+    """
+    if model_registry.versions(MODEL_NAME):
+        return
+    if not (os.path.exists(LEGACY_MODEL) and os.path.exists(LEGACY_SCALER)):
+        return
+
+    model = joblib.load(LEGACY_MODEL)
+    scaler = joblib.load(LEGACY_SCALER)
+
+    # The scaler already holds the training means / stds needed for drift checks
+    stats = {"mean": scaler.mean_.tolist(), "std": scaler.scale_.tolist()}
+    model_registry.register(
+        MODEL_NAME,
+        {"model": model, "scaler": scaler},
+        SEMISUP_FEATURES,
+        "legacy",
+        stats
+    )
 
-# Load features 
-df = pd.read_csv("PyLog/Csv/features_semisup/features_semisup.csv")
 
-def train():
+def train(force=False):
+    # Load features
+    df = frame_store.load("features")
+
     #  CLEAN DATA
     df_clean = df.fillna(0)
 
-    #  SUBSAMPLE
-    TRAIN_SIZE = 25000
+    #  REUSE THE REGISTERED MODEL UNLESS ASKED OR DRIFTED
+    import_legacy()
+    if not force and not model_registry.needs_training(
+        MODEL_NAME, SEMISUP_FEATURES, df_clean[SEMISUP_FEATURES].values
+    ):
+        print("[+] Semi-supervised model is current, training skipped")
+        return True
 
-    df_train = resample(
-        df_clean,
-        n_samples=TRAIN_SIZE,
-        random_state=500
-    )
+    # scikit-learn is only loaded when a model is actually fitted
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.utils import resample
+    from PyLog.function.semisup_engine import KNNLabelSpreading
+
+    #  SUBSAMPLE (OPTIONAL)
+    df_train = df_clean
+    if TRAIN_SIZE is not None and TRAIN_SIZE < len(df_clean):
+        df_train = resample(
+            df_clean,
+            n_samples=TRAIN_SIZE,
+            random_state=500
+        )
 
     #  SPLIT FEATURES / LABELS (SAFE)
 
-    X_train_df = df_train.drop(columns=["label"])
+    X_train_df = df_train[SEMISUP_FEATURES]
     y_train = df_train["label"]
 
     #  SCALE FEATURES (DO NOT OVERWRITE df)
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train_df)
 
-    # TRAIN SEMI-SUPERVISED MODEL
-    model = LabelSpreading(
-        kernel="rbf",
-        gamma=15,
-        max_iter=300
+    # TRAIN SEMI-SUPERVISED MODEL (sparse kNN graph, tree neighbour index)
+    model = KNNLabelSpreading(
+        n_neighbors=N_NEIGHBORS,
+        max_iter=300,
+        n_jobs=-1
     )
 
     model.fit(X_train_scaled, y_train)
+    if model.n_unreached_:
+        print(f"[+] {model.n_unreached_} rows no labeled row reaches took the nearest labeled row's label")
+
+    #REGISTER MODEL + SCALER
 
-    #SAVE MODEL + SCALER
-    
-    joblib.dump(model, "PyLog/Model/semisup_model.joblib")
-    joblib.dump(scaler, "PyLog/Model/semisup_scaler.joblib")
+    version = model_registry.register(
+        MODEL_NAME,
+        {"model": model, "scaler": scaler},
+        SEMISUP_FEATURES,
+        model_registry.fingerprint(df_clean[SEMISUP_FEATURES + ["label"]]),
+        model_registry.feature_stats(df_clean[SEMISUP_FEATURES].values),
+        params=model.get_params()
+    )
 
-    print("[+] Semi-supervised model trained successfully")
+    print(f"[+] Semi-supervised model trained successfully (v{version})")
     return True
 
 if __name__ == "__main__":
-    train()
+    train(force=True)
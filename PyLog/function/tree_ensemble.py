@@ -0,0 +1,128 @@
+import numpy as np
+
+# ------------------------------------------------
+# Decision-tree ensemble in plain NumPy arrays
+# ------------------------------------------------
+# The trees of a fitted scikit-learn forest (or a single tree), flattened
+# into one set of node arrays. Predicting and loading need NumPy only: no
+# scikit-learn import and no unpickling.
+
+BLOCK_ROWS = 4096
+
+
+class TreeEnsemble:
+    """
+    predict / predict_proba of a scikit-learn tree classifier or forest:
+    the mean of every tree's leaf class distribution, argmax for the class.
+
+    Leaves point to themselves, so every row takes exactly `depth` steps
+    down all trees at once and no per-row loop is needed.
+    """
+
+    def __init__(self, classes, roots, feature, threshold, left, right, value, depth):
+        self.classes_ = np.asarray(classes)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.depth = int(depth)
+
+        # Children interleaved, so a step is one lookup: 2 * node + went right
+        self.children = np.stack([self.left, self.right], axis=1).ravel().astype(np.intp)
+        self.features = self.feature.astype(np.intp)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        trees = [estimator.tree_ for estimator in getattr(model, "estimators_", [model])]
+
+        roots, feature, threshold, left, right, value = [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+
+            roots.append(offset)
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(np.where(leaf, 0.0, tree.threshold))
+            left.append(np.where(leaf, nodes, tree.children_left) + offset)
+            right.append(np.where(leaf, nodes, tree.children_right) + offset)
+
+            # Class counts or fractions depending on the version; as fractions
+            counts = tree.value[:, 0, :]
+            total = counts.sum(axis=1, keepdims=True)
+            value.append(counts / np.where(total > 0, total, 1.0))
+            offset += tree.node_count
+
+        return cls(
+            model.classes_,
+            roots,
+            np.concatenate(feature),
+            np.concatenate(threshold),
+            np.concatenate(left),
+            np.concatenate(right),
+            np.concatenate(value),
+            max(tree.max_depth for tree in trees),
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def apply(self, X):
+        """
+        Leaf node of every row in every tree, shape (rows, trees).
+        """
+        # float32 like scikit-learn, so ties with thresholds split the same way
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        values = X.ravel()
+        starts = (np.arange(len(X)) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots.astype(np.intp), (len(X), self.n_trees))
+        for _ in range(self.depth):
+            right = ~(values[starts + self.features[nodes]] <= self.threshold[nodes])
+            nodes = self.children[2 * nodes + right]
+        return nodes
+
+    def predict_proba(self, X):
+        X = np.asarray(X)
+        out = np.empty((len(X), len(self.classes_)))
+        # Row blocks keep the (rows, trees) step arrays in cache
+        for start in range(0, len(X), BLOCK_ROWS):
+            stop = start + BLOCK_ROWS
+            out[start:stop] = self.value[self.apply(X[start:stop])].mean(axis=1)
+        return out
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, path):
+        np.savez(
+            path,
+            classes=self.classes_,
+            roots=self.roots,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            value=self.value,
+            depth=np.array(self.depth),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(
+                arrays["classes"],
+                arrays["roots"],
+                arrays["feature"],
+                arrays["threshold"],
+                arrays["left"],
+                arrays["right"],
+                arrays["value"],
+                arrays["depth"],
+            )
@@ -1,3 +1,4 @@
+import glob
 import shutil
 import os
 
@@ -10,8 +11,14 @@ def process_log_file(file_path):
         filename = os.path.basename(file_path)
         inter_dir = os.path.join("data", "input")
         os.makedirs(inter_dir, exist_ok=True)
-        
-        dest = os.path.join(inter_dir, "input.log")
+
+        # Drop the previous upload so the parser's input.log* glob sees one log
+        for old in glob.glob(os.path.join(inter_dir, "input.log*")):
+            os.remove(old)
+
+        # Keep the compression suffix so the parser can open rotated archives
+        ext = os.path.splitext(filename)[1].lower()
+        dest = os.path.join(inter_dir, "input.log" + (ext if ext in (".gz", ".bz2") else ""))
         
         # Copy the file to simulate processing
         shutil.copy(file_path, dest)
@@ -20,4 +27,4 @@ def process_log_file(file_path):
         return True 
     except Exception as e:
         print(f"Model I Error: {e}")
-        return False
\ No newline at end of file
+        return False
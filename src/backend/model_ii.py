@@ -1,19 +1,152 @@
 import os
 
+from PyLog.function.lazy import lazy_import
+
+# Loaded when results are first shown, not when the app starts
+np = lazy_import("numpy")
+aggregate_7 = lazy_import("PyLog.function.aggregate_7")
+
+# Charts are drawn with the Agg backend straight onto Figure objects (no
+# pyplot), so rendering is safe off the Tk thread. Each one is rendered once
+# per analysis at display size and reused until the aggregates change.
+CHART_DIR = os.path.join("data", "output", "charts")
+CHART_SIZE = (8.4, 4.2)   # inches
+CHART_DPI = 100
+
+CHART_FILES = {
+    "Heat Map": "heat_map.png",
+    "Bar Graph": "bar_graph.png",
+    "Pie Chart": "pie_chart.png",
+}
+
+# Pie slices beyond this many are merged into "other"
+MAX_SLICES = 6
+
+BACKGROUND = "#000000"
+FOREGROUND = "#DDDDDD"
+ALERT_COLORS = {"high": "#FF3B30", "medium": "#FF9F0A", "none": "#3A3A3C"}
+
+
+def _figure():
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=CHART_SIZE, dpi=CHART_DPI, facecolor=BACKGROUND)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_facecolor(BACKGROUND)
+    ax.tick_params(colors=FOREGROUND, labelsize=8)
+    for spine in ax.spines.values():
+        spine.set_color("#444444")
+    return fig, ax
+
+
+def heat_map(aggregates, ax):
+    heat = aggregates["heat_map"]
+    if not heat["ips"]:
+        ax.text(0.5, 0.5, "No timestamped requests", color=FOREGROUND, ha="center", transform=ax.transAxes)
+        return
+
+    counts = np.asarray(heat["counts"])
+    image = ax.imshow(counts, aspect="auto", cmap="inferno", interpolation="nearest")
+    ax.set_xticks(range(0, 24, 2))
+    ax.set_yticks(range(len(heat["ips"])))
+    ax.set_yticklabels(heat["ips"], fontsize=6)
+    ax.set_xlabel("Hour of day", color=FOREGROUND)
+    ax.set_title(f"Requests per hour, top {len(heat['ips'])} source IPs", color=FOREGROUND)
+    ax.figure.colorbar(image, ax=ax).ax.tick_params(colors=FOREGROUND, labelsize=7)
+
+
+def bar_graph(aggregates, ax):
+    alerts = aggregates["threat_alerts"]
+    threats = sorted(alerts)
+    bottom = np.zeros(len(threats))
+
+    for level, color in ALERT_COLORS.items():
+        values = np.array([alerts[t].get(level, 0) for t in threats])
+        ax.bar(threats, values, bottom=bottom, color=color, label=level)
+        bottom += values
+
+    ax.set_ylabel("Events", color=FOREGROUND)
+    ax.set_title("Alerts per threat type", color=FOREGROUND)
+    ax.legend(title="alert level", fontsize=7, title_fontsize=7)
+
+
+def pie_chart(aggregates, ax):
+    names = aggregates["label_names"]
+    counts = sorted(aggregates["predicted_labels"].items(), key=lambda item: -item[1])
+
+    labels = [names.get(label, label) for label, _ in counts[:MAX_SLICES]]
+    values = [count for _, count in counts[:MAX_SLICES]]
+    if len(counts) > MAX_SLICES:
+        labels.append("other")
+        values.append(sum(count for _, count in counts[MAX_SLICES:]))
+
+    if not values:
+        ax.text(0.5, 0.5, "No predictions", color=FOREGROUND, ha="center", transform=ax.transAxes)
+        return
+
+    ax.pie(values, labels=labels, autopct="%1.1f%%", textprops={"color": FOREGROUND, "fontsize": 8})
+    ax.set_title("Predicted label distribution", color=FOREGROUND)
+
+
+CHARTS = {
+    "Heat Map": heat_map,
+    "Bar Graph": bar_graph,
+    "Pie Chart": pie_chart,
+}
+
+
+def render_charts(aggregates, source_mtime=0):
+    """
+    Renders every chart to PNG unless a copy newer than the aggregates exists.
+    Returns {chart name: png path}.
+    """
+    os.makedirs(CHART_DIR, exist_ok=True)
+    paths = {}
+
+    for name, draw in CHARTS.items():
+        path = os.path.join(CHART_DIR, CHART_FILES[name])
+        if not os.path.exists(path) or os.path.getmtime(path) < source_mtime:
+            fig, ax = _figure()
+            draw(aggregates, ax)
+            fig.tight_layout()
+            fig.savefig(path, facecolor=BACKGROUND)
+        paths[name] = path
+
+    return paths
+
+
+def summary_text(aggregates):
+    names = aggregates["label_names"]
+    lines = ["ANALYSIS COMPLETE:", "", f"Events analysed: {aggregates['rows']:,}", "", "Alerts:"]
+
+    levels = {}
+    for by_level in aggregates["threat_alerts"].values():
+        for level, count in by_level.items():
+            levels[level] = levels.get(level, 0) + count
+    for level in ["high", "medium"]:
+        lines.append(f"  {level}: {levels.get(level, 0):,}")
+
+    lines += ["", "Threat types:"]
+    for threat, by_level in sorted(aggregates["threat_alerts"].items()):
+        lines.append(f"  {threat}: {sum(by_level.values()):,}")
+
+    lines += ["", "Predicted labels:"]
+    for label, count in sorted(aggregates["predicted_labels"].items(), key=lambda item: -item[1]):
+        lines.append(f"  {names.get(label, label)}: {count:,}")
+
+    return "\n".join(lines)
+
+
 def generate_results():
     """
-    Saves a dummy output file and returns the Hello World text.
+    Returns the result text and {chart name: png path} from the aggregates
+    written after analysis (computed here if they are missing).
     """
-    # Create output directory if it doesn't exist
-    output_dir = os.path.join("data", "output")
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Simulate saving a CSV to the output folder
-    output_path = os.path.join(output_dir, "results.csv")
-    with open(output_path, "w") as f:
-        f.write("column1,column2\nhello,world")
-        
-    text_result = "ANALYSIS COMPLETE:\n\nHello World"
-    
-    # Return text and None for graphs (UI handles the placeholder slides)
-    return text_result, None
\ No newline at end of file
+    if not os.path.exists(aggregate_7.AGGREGATES_FILE):
+        aggregate_7.summarize()
+
+    aggregates = aggregate_7.load_aggregates()
+    graphs = render_charts(aggregates, os.path.getmtime(aggregate_7.AGGREGATES_FILE))
+    return summary_text(aggregates), graphs
@@ -1,18 +1,17 @@
 import customtkinter as ctk
 from tkinter import filedialog
-# from PIL import Image
+from PIL import Image
 import os
 # import shutil
 # import time
+import queue
 import threading
 
 #PyLog Folder
-from PyLog.function import parse_log_1
-from PyLog.function import prepare_labels_2
-from PyLog.function import features_3
-from PyLog.function import train_semisup_4
-from PyLog.function import predict_semisup_5
-from PyLog.function import train_iforest_6
+from PyLog.function import pipeline
+from PyLog.function import frame_store
+from PyLog.function import instrument
+from PyLog.function import progress
 # ==========================================================
 # COLOR CONFIGURATION
 # ==========================================================
@@ -29,6 +28,17 @@ COLOR_TITLE_BLUE      = "#1F77B4"
 COLOR_NAV_RED         = "#FF0000"  
 # ==========================================================
 
+# Also write data/output/final_output.csv for analysts after each run
+EXPORT_FINAL_CSV = False
+
+# Worker threads never touch widgets; they queue events that the Tk thread
+# drains every POLL_MS, at most MAX_EVENTS_PER_POLL per tick.
+POLL_MS = 50
+MAX_EVENTS_PER_POLL = 200
+
+# Charts are shrunk to fit a graph box before they reach the Tk thread
+CHART_DISPLAY_SIZE = (800, 400)
+
 ctk.set_appearance_mode("dark")
 
 class SkillApp(ctk.CTk):
@@ -44,7 +54,14 @@ class SkillApp(ctk.CTk):
         self.show_result_callback = show_result_callback
         self.selected_file_path = None
         
-        self.result_cache = {"text": None, "graphs_ready": False} 
+        self.result_cache = {"text": None, "graphs_ready": False, "images": {}} 
+        # Set while a results thread runs; generation counts finished analyses
+        self.results_busy = False
+        self.result_generation = 0
+
+        self.events = queue.Queue()
+        self.cancel_token = None
+        self.stage_index, self.stage_count, self.stage_label = 0, 1, ""
 
         self.grid_columnconfigure(1, weight=1)
         self.grid_rowconfigure(1, weight=1)
@@ -63,6 +80,9 @@ class SkillApp(ctk.CTk):
         ctk.CTkLabel(self.sidebar, text="Operations", font=("Arial", 15, "bold")).pack(pady=(10, 0))
         self.status_lbl = ctk.CTkLabel(self.sidebar, text="STATUS: Idle", text_color="grey", font=("Arial", 10, "italic"))
         self.status_lbl.pack(pady=(0, 5))
+        self.progress_bar = ctk.CTkProgressBar(self.sidebar, width=180, height=8)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(pady=(0, 5), padx=20)
 
         self.btn_upload = ctk.CTkButton(self.sidebar, text="Log Upload", height=28, command=self.upload_file)
         self.btn_upload.pack(pady=2, padx=20)
@@ -70,6 +90,8 @@ class SkillApp(ctk.CTk):
         self.btn_run.pack(pady=2, padx=20)
         self.btn_show = ctk.CTkButton(self.sidebar, text="Show Result", height=28, state="disabled", command=self.start_result_thread)
         self.btn_show.pack(pady=2, padx=20)
+        self.btn_cancel = ctk.CTkButton(self.sidebar, text="Cancel Analysis", height=28, state="disabled", command=self.cancel_analysis)
+        self.btn_cancel.pack(pady=2, padx=20)
 
         ctk.CTkLabel(self.sidebar, text="Graphs and Charts", font=("Arial", 13)).pack(pady=(10, 2))
         for name in ["Heat Map", "Bar Graph", "Pie Chart"]:
@@ -107,11 +129,51 @@ class SkillApp(ctk.CTk):
         self.update_feedback("SYSTEM: Ready.")
         self.update_feedback("SUGGESTION: Please upload a log file to begin the program.")
 
+        self.after(POLL_MS, self._drain_events)
+
     # --- Methods ---
 
+    # Safe to call from any thread: everything below goes through self.events
+
     def update_feedback(self, msg):
-        self.feedback_box.insert("end", f"> {msg}\n")
-        self.feedback_box.see("end")
+        self.events.put(("feedback", f"> {msg}\n"))
+
+    def update_feedback_row(self, row):
+        # Table rows stay unprefixed so the columns line up
+        self.events.put(("feedback", f"{row}\n"))
+
+    def call_in_ui(self, func, *args):
+        self.events.put(("call", func, args))
+
+    def _drain_events(self):
+        """Applies queued worker events on the Tk thread, then reschedules itself"""
+        try:
+            for _ in range(MAX_EVENTS_PER_POLL):
+                kind, *payload = self.events.get_nowait()
+                if kind == "feedback":
+                    self.feedback_box.insert("end", payload[0])
+                    self.feedback_box.see("end")
+                elif kind == "progress":
+                    self._show_progress(payload[0])
+                elif kind == "call":
+                    func, args = payload
+                    func(*args)
+        except queue.Empty:
+            pass
+        self.after(POLL_MS, self._drain_events)
+
+    def _show_progress(self, event):
+        if event["kind"] == "stage":
+            self.stage_index, self.stage_count, self.stage_label = event["index"], event["count"], event["label"]
+            fraction, detail = 0.0, ""
+        elif event["total"]:
+            fraction = min(event["done"] / event["total"], 1.0)
+            detail = f" {fraction:.0%}"
+        else:
+            fraction, detail = 0.0, f" {event['done']:,} {event['unit']}"
+
+        self.progress_bar.set((self.stage_index + fraction) / self.stage_count)
+        self.status_lbl.configure(text=f"STATUS: {self.stage_label}{detail}", text_color="white")
 
     def upload_file(self):
         file = filedialog.askopenfilename()
@@ -125,54 +187,118 @@ class SkillApp(ctk.CTk):
         self.btn_run.configure(state="normal")
 
     def start_analysis_thread(self):
-        threading.Thread(target=self._run_analysis).start()
-    def _run_analysis(self):
-        success = self.run_analysis_callback(self.selected_file_path)
-
-        #parse_log_1.py run
-        result = parse_log_1.parser()
-        if result:
-            self.update_feedback("<-- Phase One OK -->\n")
-        
-        #prepare_labels_2.py run
-        result = prepare_labels_2.prepare()
-        if result:
-            self.update_feedback("<-- Phase Two OK -->\n")
-
-        #features_3.py run
-        result=features_3.features()
-        if result:
-            self.update_feedback("<-- Phase Three OK-->\n")
-        
-        #train_semisup_4.py run
-        result = train_semisup_4.train()
-        if result:
-            self.update_feedback("<-- Phase Four OK-->\n")
-
-        #predict_semisup_5 run
-        result = predict_semisup_5.predict()
-        if result:
-            self.update_feedback("<-- Phase five OK -->\n")
+        self.cancel_token = progress.CancelToken()
+        self.btn_run.configure(state="disabled")
+        self.btn_show.configure(state="disabled")
+        self.btn_cancel.configure(state="normal")
+        self.progress_bar.set(0)
+        threading.Thread(target=self._run_analysis, args=(self.cancel_token,), daemon=True).start()
+
+    def cancel_analysis(self):
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+            self.btn_cancel.configure(state="disabled")
+            self.update_feedback("SYSTEM: Cancelling after the current batch...")
+
+    def _run_analysis(self, token):
+        success = completed = False
+        try:
+            success = self.run_analysis_callback(self.selected_file_path)
+
+            # Every phase runs in this process, so hand frames over in memory
+            frame_store.KEEP_IN_MEMORY = True
+            frame_store.clear_memory()
+
+            # Phases whose inputs, code and params are unchanged reuse cached outputs.
+            # Each finished phase adds a row to the live timing table.
+            self.update_feedback("PHASE TIMINGS:")
+            self.update_feedback_row(instrument.TABLE_HEADER)
+            completed = pipeline.run(
+                on_metrics=lambda record: self.update_feedback_row(
+                    instrument.format_row(record) + (" (cached)" if record["status"] == "cached" else "")
+                ),
+                listener=lambda event: self.events.put(("progress", event)),
+                cancel=token,
+            )
+
+            if completed and EXPORT_FINAL_CSV:
+                frame_store.export_csv("final_output")
+        except Exception as e:
+            success = completed = False
+            self.update_feedback(f"ERROR: {type(e).__name__}: {e}")
+        finally:
+            frame_store.clear_memory()
+            # Always hand the buttons back, whatever happened above
+            self.call_in_ui(self._analysis_finished, success and completed, token.cancelled)
+
+    def _analysis_finished(self, success, cancelled):
+        self.btn_cancel.configure(state="disabled")
+        self.btn_run.configure(state="normal")
+        self.cancel_token = None
 
-        #train_iforest_6 run
-        result = train_iforest_6.iforest()
-        if result:
-            self.update_feedback("<-- Final Phase ok-->\n")
+        if cancelled:
+            self.status_lbl.configure(text="STATUS: Cancelled", text_color="grey")
+            self.update_feedback("SYSTEM: Analysis cancelled.")
+            return
 
         if success:
+            self.progress_bar.set(1)
+            self.status_lbl.configure(text="STATUS: Done", text_color="grey")
+            self.result_cache["text"] = None
+            self.result_cache["images"] = {}
+            self.result_generation += 1
             self.update_feedback("CONFIRMATION: Analysis complete.")
             self.update_feedback("SUGGESTION: Click 'Show Result' to generate visualizations.")
             self.btn_show.configure(state="normal")
+        else:
+            self.status_lbl.configure(text="STATUS: Failed", text_color="grey")
+            self.update_feedback("ERROR: Analysis failed. See the console for details.")
 
     def start_result_thread(self):
-        threading.Thread(target=self._show_results).start()
+        # One results job at a time; the cache is only changed on the Tk thread
+        if self.results_busy:
+            self.update_feedback("SYSTEM: Results are still being generated...")
+            return
+        self.results_busy = True
+        cached = bool(self.result_cache["text"])
+        threading.Thread(target=self._show_results, args=(cached, self.result_generation), daemon=True).start()
+
+    def _show_results(self, cached, generation):
+        """Computes results off the Tk thread, then hands drawing back to it"""
+        if cached:
+            self.call_in_ui(self._results_ready, generation, None, None)
+            return
 
-    def _show_results(self):
-        """Loads all graphs vertically with 'Peeking' height for scrolling"""
-        if not self.result_cache["text"]:
-            text_data, _ = self.show_result_callback()
+        try:
+            text_data, graphs = self.show_result_callback()
+
+            # Decode and downsample here so the Tk thread only wraps ready images
+            images = {}
+            for name, path in (graphs or {}).items():
+                image = Image.open(path)
+                image.thumbnail(CHART_DISPLAY_SIZE)
+                images[name] = image.copy()
+        except Exception as e:
+            self.update_feedback(f"ERROR: Could not generate results ({type(e).__name__}: {e}).")
+            self.call_in_ui(self._results_failed)
+            return
+        self.call_in_ui(self._results_ready, generation, text_data, images)
+
+    def _results_ready(self, generation, text_data, images):
+        self.results_busy = False
+        # Results of an analysis that has been replaced since are dropped
+        if generation != self.result_generation:
+            return
+        if text_data is not None:
+            self.result_cache["images"] = images
             self.result_cache["text"] = text_data
-        
+        self._render_results()
+
+    def _results_failed(self):
+        self.results_busy = False
+
+    def _render_results(self):
+        """Loads all graphs vertically with 'Peeking' height for scrolling"""
         self.result_text.configure(state="normal")
         self.result_text.delete("0.0", "end")
         self.result_text.insert("0.0", self.result_cache["text"])
@@ -190,7 +316,6 @@ class SkillApp(ctk.CTk):
         
         for name, color in graphs:
             self._create_graph_box(name, color, peak_view=True)
-            self.update() 
         
         self.update_feedback("SUGGESTION: Scroll down to see other graphs or use sidebar buttons.")
 
@@ -227,4 +352,13 @@ class SkillApp(ctk.CTk):
         inner = ctk.CTkFrame(box, fg_color="#000000", corner_radius=15)
         inner.pack(expand=True, fill="both", padx=20, pady=(0, 20))
         
-        ctk.CTkLabel(inner, text=f"{name} Visualization Content", text_color="#555555").pack(expand=True)
\ No newline at end of file
+        image = self.result_cache["images"].get(name)
+        if image is None:
+            ctk.CTkLabel(inner, text=f"{name} Visualization Content", text_color="#555555").pack(expand=True)
+            return
+
+        # CTkImage objects are made once per chart, so switching views is instant
+        if not isinstance(image, ctk.CTkImage):
+            image = ctk.CTkImage(light_image=image, dark_image=image, size=image.size)
+            self.result_cache["images"][name] = image
+        ctk.CTkLabel(inner, image=image, text="").pack(expand=True)
\ No newline at end of file